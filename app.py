@@ -1,23 +1,46 @@
 import streamlit as st
-from civicgpt_chain import get_civic_answer
+from civicgpt_chain import stream_civic_answer
+from utilities.clients import warm_up
 
 st.set_page_config(page_title="LocalGovGPT NZ", page_icon="🇳🇿", layout="centered")
 
+
+# Runs once per server process; every session then shares the pooled clients.
+@st.cache_resource
+def load_clients():
+    warm_up()
+    return True
+
+
+load_clients()
+
 st.title("🇳🇿 LocalGovGPT NZ")
 st.subheader("Ask a local government question:")
 user_question = st.text_input("Your question", placeholder="e.g. How do I report a broken footpath in Auckland?")
 
 if user_question:
+    events = stream_civic_answer(user_question)
     with st.spinner("Finding an answer..."):
-        response = get_civic_answer(user_question)
+        # Retrieval finishes before generation starts, so sources come first
+        sources = next(events)["sources"]
+
+    timings = {}
+
+    def answer_tokens():
+        for event in events:
+            if event["type"] == "token":
+                yield event["text"]
+            elif event["type"] == "done":
+                timings.update(event["timings"])
 
     st.markdown("### 🧠 Answer")
-    st.write(response["answer"])
+    st.write_stream(answer_tokens())
+    st.caption(f"⏱️ First token in {timings['first_token']:.2f}s · full answer in {timings['total']:.2f}s")
 
-    if response["sources"]:
+    if sources:
         st.markdown("---")
         st.markdown("### 🔗 Sources consulted")
-        for i, source in enumerate(response["sources"], 1):
+        for i, source in enumerate(sources, 1):
             st.markdown(f"**{i}.** [{source}]({source})")
     else:
         st.info("No sources found for this response.")
@@ -0,0 +1,83 @@
+# =============================
+# bench_chunker.py
+# =============================
+# Splitting the fetched corpus: LangChain's TokenTextSplitter on one core
+# versus the single-encode chunker, on one core and across a process pool
+# of councils, plus an incremental re-run with nothing changed.
+#
+#   python3 benchmarks/bench_chunker.py                  # data/archive
+#   python3 benchmarks/bench_chunker.py path/to/archive
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from langchain.text_splitter import TokenTextSplitter
+
+import split_documents
+from utilities.chunker import CHUNK_OVERLAP, CHUNK_SIZE, ENCODING_NAME, chunk_text, get_encoding
+from utilities.page_archive import PAGE_ARCHIVE_PATH, PageArchive, archived_councils
+
+
+def load_texts(archive_root):
+    texts = []
+    for council_id in archived_councils(archive_root):
+        with PageArchive(os.path.join(archive_root, council_id)) as archive:
+            texts.extend(page.text for page in archive.scan())
+    return texts
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    archive_root = sys.argv[1] if len(sys.argv) > 1 else PAGE_ARCHIVE_PATH
+    texts = load_texts(archive_root)
+    if not texts:
+        print(f"[!] No archived pages under {archive_root}")
+        return
+    encoding = get_encoding()
+    n_tokens = sum(len(encoding.encode_ordinary(text)) for text in texts)
+    print(f"[🧪] {len(texts)} pages, {n_tokens} tokens, {sum(map(len, texts)) / 1e6:.1f}M chars")
+
+    splitter = TokenTextSplitter(encoding_name=ENCODING_NAME, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    baseline, baseline_s = timed(lambda: [splitter.split_text(text) for text in texts])
+    chunked, chunked_s = timed(lambda: [chunk_text(text, encoding) for text in texts])
+
+    # The chunker reproduces TokenTextSplitter's chunks exactly, so this
+    # should always be 0
+    differing = sum(
+        [chunk for chunk, _, _ in new] != old for old, new in zip(baseline, chunked)
+    )
+
+    shards_path = tempfile.mkdtemp(prefix="bench_chunker_")
+    split_documents.SPLIT_DOCS_PATH = shards_path
+    try:
+        _, pool_s = timed(lambda: split_documents.split_documents(full=True, archive_root=archive_root))
+        _, rerun_s = timed(lambda: split_documents.split_documents(archive_root=archive_root))
+    finally:
+        shutil.rmtree(shards_path)
+
+    n_chunks = sum(map(len, chunked))
+    print(f"\n⏱️ {n_chunks} chunks of {CHUNK_SIZE} tokens, {split_documents.SPLIT_WORKERS} workers")
+    print(f"{'mode':<34}{'seconds':>10}{'tokens/s':>14}")
+    for label, seconds in [
+        ("TokenTextSplitter, 1 core", baseline_s),
+        ("single-encode chunker, 1 core", chunked_s),
+        ("split_documents --full (pool)", pool_s),
+        ("split_documents, unchanged rerun", rerun_s),
+    ]:
+        print(f"{label:<34}{seconds:>10.2f}{n_tokens / seconds:>14,.0f}")
+    print(f"\nPages whose chunks differ from TokenTextSplitter: {differing} (expected 0)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# =============================
+# bench_crawl_event_loop.py
+# =============================
+# Event-loop stall and wall time for concurrent crawls against local test
+# sites, with page extraction run inline on the loop (the old behaviour)
+# versus offloaded to the extraction process pool.
+#
+#   python3 benchmarks/bench_crawl_event_loop.py [sites] [pages_per_site]
+
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+import contextlib
+from io import StringIO
+
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "scripts"))
+
+import fetch_and_save_documents as crawler
+from utilities.extraction import make_extraction_pool
+from utilities.loop_monitor import LoopStallMonitor
+
+WORDS = ("rates rubbish collection council consent building dog registration bylaw "
+         "resource water parking library pool park road footpath permit fee").split()
+
+
+def make_page(site_url, n, pages_per_site):
+    rng = random.Random(n)
+    paragraphs = "".join(
+        f"<p>{' '.join(rng.choices(WORDS, k=120))}</p>" for _ in range(40)
+    )
+    links = "".join(
+        f'<li><a href="{site_url}/page/{rng.randrange(pages_per_site)}">link</a></li>' for _ in range(150)
+    )
+    return (f"<html><head><title>Page {n}</title></head><body><nav><ul>{links}</ul></nav>"
+            f"<article><h1>Council page {n}</h1>{paragraphs}</article></body></html>")
+
+
+async def start_site(pages_per_site):
+    app = web.Application()
+    pages = {}
+
+    async def sitemap(request):
+        site_url = f"http://{request.host}"
+        locs = "".join(f"<url><loc>{site_url}/page/{n}</loc></url>" for n in range(pages_per_site))
+        return web.Response(text=f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>',
+                            content_type="application/xml")
+
+    async def page(request):
+        await asyncio.sleep(0.02)  # a little server latency
+        n = int(request.match_info["n"])
+        if n not in pages:
+            pages[n] = make_page(f"http://{request.host}", n, pages_per_site)
+        return web.Response(text=pages[n], content_type="text/html")
+
+    app.router.add_get("/sitemap.xml", sitemap)
+    app.router.add_get("/page/{n}", page)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def run(n_sites, pages_per_site, offload):
+    runners, sites = zip(*[await start_site(pages_per_site) for _ in range(n_sites)])
+    monitor = LoopStallMonitor().start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(StringIO()), contextlib.redirect_stderr(StringIO()):
+        if offload:
+            with make_extraction_pool() as pool:
+                await crawler.crawl_all_sites(list(sites), pages_per_site, 1, pool=pool)
+        else:
+            await crawler.crawl_all_sites(list(sites), pages_per_site, 1, pool=None)
+    duration = time.perf_counter() - start
+    await monitor.stop()
+    for runner in runners:
+        await runner.cleanup()
+    return duration, monitor
+
+
+def main():
+    n_sites = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    pages_per_site = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    crawler.DELAY_BETWEEN_REQUESTS = 0.05
+
+    # The crawler writes data/ and logs/ relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench_crawl_"))
+    print(f"[🧪] {n_sites} sites x {pages_per_site} pages, {os.cpu_count()} CPUs")
+    for label, offload in [("inline (before)", False), ("process pool", True)]:
+        duration, monitor = asyncio.run(run(n_sites, pages_per_site, offload))
+        print(f"{label:<16} wall {duration:6.2f}s  {monitor.summary()}")
+
+
+if __name__ == "__main__":
+    main()
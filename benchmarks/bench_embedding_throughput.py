@@ -0,0 +1,70 @@
+# =============================
+# bench_embedding_throughput.py
+# =============================
+# Embedding throughput against the mock embeddings server: the old single
+# sequential request stream versus the rate-limit-aware scheduler at a few
+# concurrency levels. Runs offline; the mock enforces its own TPM/RPM and
+# injects 5xx errors, so retries and backoff are exercised too.
+#
+#   python3 benchmarks/bench_embedding_throughput.py [chunks]
+
+import os
+import sys
+import time
+import random
+import asyncio
+import contextlib
+from io import StringIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+from mock_embedding_server import start_server
+from utilities.embedding_scheduler import EmbeddingScheduler
+
+WORDS = ("rates rubbish collection council consent building dog registration bylaw "
+         "resource water parking library pool park road footpath permit fee").split()
+MOCK_TPM = 20_000_000
+MOCK_RPM = 300
+
+
+def make_chunks(n):
+    rng = random.Random(0)
+    return [" ".join(rng.choices(WORDS, k=350)) for _ in range(n)]
+
+
+async def run(texts, concurrency, max_batch_tokens):
+    runner, server, base_url = await start_server(tpm=MOCK_TPM, rpm=MOCK_RPM)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    scheduler = EmbeddingScheduler(tpm=MOCK_TPM, rpm=MOCK_RPM, embed_concurrency=concurrency,
+                                   max_batch_tokens=max_batch_tokens)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(StringIO()):
+        vectors = await scheduler.embed(texts)
+    duration = time.perf_counter() - start
+    await runner.cleanup()
+    assert all(vector is not None for vector in vectors)
+    return duration, scheduler, server
+
+
+def main():
+    n_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    texts = make_chunks(n_chunks)
+    print(f"[🧪] {n_chunks} chunks, mock limits {MOCK_TPM} TPM / {MOCK_RPM} RPM")
+    # 100 chunks per request, one at a time, approximates the old
+    # BATCH_SIZE loop; the rest pack requests by tokens and run concurrently.
+    for label, concurrency, max_batch_tokens in [
+        ("sequential x100", 1, 100 * 900),
+        ("scheduler c=4", 4, 20_000),
+        ("scheduler c=8", 8, 20_000),
+        ("scheduler c=32", 32, 20_000),
+    ]:
+        duration, scheduler, server = asyncio.run(run(texts, concurrency, max_batch_tokens))
+        print(f"{label:<16} {duration:6.2f}s  {n_chunks / duration:8.0f} chunks/s  "
+              f"{scheduler.summary()}  (server: {server.counts})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# =============================
+# bench_html_extraction.py
+# =============================
+# Per-page CPU time of page extraction: the old path (trafilatura on the
+# HTML string, then a BeautifulSoup parse for links) versus one lxml parse
+# shared by the XPath link extractor and trafilatura.
+#
+#   python3 benchmarks/bench_html_extraction.py              # synthetic pages
+#   python3 benchmarks/bench_html_extraction.py saved_pages/ # *.html files
+
+import os
+import sys
+import time
+import random
+from urllib.parse import urljoin
+
+import numpy as np
+import trafilatura
+from bs4 import BeautifulSoup
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utilities.extraction import extract_page, get_domain_root, is_same_domain
+
+N_PAGES = 200
+BASE_URL = "https://www.council.govt.nz/services/page"
+WORDS = ("rates rubbish collection council consent building dog registration bylaw "
+         "resource water parking library pool park road footpath permit fee").split()
+
+
+def legacy_extract_page(url, html, collect_links):
+    # The extraction path before the single-parse change
+    text = trafilatura.extract(html)
+    links = set()
+    if collect_links:
+        soup = BeautifulSoup(html, "html.parser")
+        for a_tag in soup.find_all("a", href=True):
+            href = a_tag["href"]
+            if href.startswith("mailto:") or href.startswith("tel:"):
+                continue
+            full_url = urljoin(url, href)
+            if is_same_domain(full_url, get_domain_root(url)):
+                links.add(full_url.split("#")[0])
+    return text, links
+
+
+def make_page(n):
+    # Council-site shaped: big nav and footer, one article
+    rng = random.Random(n)
+    nav = "".join(f'<li><a href="/services/{rng.randrange(500)}">Service</a></li>' for _ in range(120))
+    footer = "".join(f'<a href="https://other.govt.nz/{i}">x</a><a href="mailto:info@council.govt.nz">mail</a>'
+                     for i in range(20))
+    paragraphs = "".join(
+        f"<p>{' '.join(rng.choices(WORDS, k=80))} <a href='../related/{rng.randrange(500)}#top'>more</a></p>"
+        for _ in range(30)
+    )
+    return (f"<!DOCTYPE html><html><head><title>Page {n}</title><script>var x = {n};</script></head>"
+            f"<body><header><nav><ul>{nav}</ul></nav></header><main><article><h1>Council page {n}</h1>"
+            f"{paragraphs}</article></main><footer>{footer}</footer></body></html>")
+
+
+def load_pages(path):
+    pages = []
+    for name in sorted(os.listdir(path)):
+        if name.endswith(".html"):
+            with open(os.path.join(path, name), "r", errors="replace") as f:
+                pages.append(f.read())
+    return pages
+
+
+def cpu_times(fn, pages):
+    timings, results = [], []
+    for n, html in enumerate(pages):
+        start = time.process_time()
+        results.append(fn(f"{BASE_URL}/{n}", html, True))
+        timings.append(time.process_time() - start)
+    return np.array(timings) * 1000, results
+
+
+def main():
+    pages = load_pages(sys.argv[1]) if len(sys.argv) > 1 else [make_page(n) for n in range(N_PAGES)]
+    print(f"[🧪] {len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1000:.0f} KB average")
+
+    extract_page(BASE_URL, pages[0], True)  # warm imports and caches
+    legacy_ms, legacy_results = cpu_times(legacy_extract_page, pages)
+    single_ms, single_results = cpu_times(extract_page, pages)
+
+    print(f"\n⏱️ CPU time per page (ms)")
+    print(f"{'path':<28}{'mean':>8}{'p50':>8}{'p95':>8}")
+    for label, timings in [("trafilatura + BeautifulSoup", legacy_ms), ("single lxml parse", single_ms)]:
+        print(f"{label:<28}{timings.mean():>8.2f}{np.median(timings):>8.2f}{np.percentile(timings, 95):>8.2f}")
+    print(f"\nSpeed-up: {legacy_ms.mean() / single_ms.mean():.2f}x")
+    print(f"Same text: {sum(a[0] == b[0] for a, b in zip(legacy_results, single_results))}/{len(pages)}, "
+          f"same links: {sum(a[1] == b[1] for a, b in zip(legacy_results, single_results))}/{len(pages)}")
+
+
+if __name__ == "__main__":
+    main()
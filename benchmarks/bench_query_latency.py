@@ -0,0 +1,82 @@
+# =============================
+# bench_query_latency.py
+# =============================
+# Per-query latency of get_civic_answer with clients rebuilt on every call
+# (the old behaviour) versus the shared, pooled client layer. The query
+# embedding cache is bypassed and the answer cache cleared before each
+# call, so every call makes the embedding, search and chat requests;
+# answer cache hits are reported as their own row.
+#
+#   python3 benchmarks/bench_query_latency.py [rounds]
+
+import os
+import sys
+import time
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import civicgpt_chain
+from civicgpt_chain import get_civic_answer
+from utilities.clients import reset_clients, warm_up
+
+QUESTIONS = [
+    "How do I report illegal dumping?",
+    "When is rubbish collection day in Wellington?",
+    "How do I apply for a LIM report?",
+    "How do I register my dog in Auckland?",
+    "Who do I contact about a broken footpath?",
+]
+
+
+class NoEmbeddingCache:
+    # Stands in for civicgpt_chain.query_embedding_cache: the same questions
+    # repeat every round and would otherwise never reach the client
+    def embed_query(self, question, embed_fn):
+        return list(embed_fn(question))
+
+
+def time_queries(questions, rounds, fresh_clients=False, cached=False):
+    timings = []
+    for _ in range(rounds):
+        for question in questions:
+            if fresh_clients:
+                reset_clients()
+            if not cached:
+                civicgpt_chain.answer_cache.invalidate()
+            start = time.perf_counter()
+            get_civic_answer(question)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    print(f"{label:<16} n={len(timings):<4} "
+          f"p50={statistics.median(timings) * 1000:8.1f} ms  "
+          f"p95={p95 * 1000:8.1f} ms  "
+          f"mean={statistics.mean(timings) * 1000:8.1f} ms")
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    civicgpt_chain.query_embedding_cache = NoEmbeddingCache()
+
+    before = time_queries(QUESTIONS, rounds, fresh_clients=True)
+
+    reset_clients()
+    warm_up()
+    after = time_queries(QUESTIONS, rounds, fresh_clients=False)
+
+    # The last round left every question's answer in the cache
+    hits = time_queries(QUESTIONS, rounds, cached=True)
+
+    print("\n⏱️ get_civic_answer latency")
+    report("per-call clients", before)
+    report("shared clients", after)
+    report("answer cache hit", hits)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# =============================
+# bench_vector_index.py
+# =============================
+# Recall / latency / memory of exact float32 search versus int8 codes with
+# oversample-and-rescore, on the local vector store.
+#
+#   python3 benchmarks/bench_vector_index.py              # synthetic 40k x 1536
+#   python3 benchmarks/bench_vector_index.py data/vector_store
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utilities.vector_index import CODES_FILE, VECTORS_FILE, LocalVectorIndex, quantise_index
+
+N_VECTORS = 40_000
+DIM = 1536
+N_CLUSTERS = 400
+N_QUERIES = 200
+TOP_K = 10
+OVERSAMPLES = [1, 2, 4, 8]
+
+
+def build_synthetic_index(path, n=N_VECTORS, dim=DIM, seed=0):
+    # Clustered rows, closer to real chunk embeddings than isotropic noise
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((N_CLUSTERS, dim)).astype(np.float32)
+    index = LocalVectorIndex(path, dim=dim)
+    for start in range(0, n, 5000):
+        count = min(5000, n - start)
+        rows = centres[rng.integers(0, N_CLUSTERS, count)] + 0.8 * rng.standard_normal((count, dim)).astype(np.float32)
+        index.upsert(vectors=[(f"v{start + i}", rows[i], {}) for i in range(count)])
+
+
+def sample_queries(path, n_queries=N_QUERIES, seed=1):
+    rng = np.random.default_rng(seed)
+    with open(os.path.join(path, VECTORS_FILE), "rb") as f:
+        vectors = np.frombuffer(f.read(), dtype=np.float32).reshape(-1, DIM)
+    picks = vectors[rng.integers(0, len(vectors), n_queries)]
+    return picks + 0.02 * rng.standard_normal(picks.shape).astype(np.float32)
+
+
+def run(index, queries, oversample):
+    timings, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        matches = index.query(vector=query, top_k=TOP_K, oversample=oversample)["matches"]
+        timings.append(time.perf_counter() - start)
+        results.append({match["id"] for match in matches})
+    return timings, results
+
+
+def main():
+    if len(sys.argv) > 1:
+        path, cleanup = sys.argv[1], False
+    else:
+        path, cleanup = tempfile.mkdtemp(prefix="bench_vector_index_"), True
+        print(f"[🧪] Building synthetic index with {N_VECTORS} x {DIM} vectors...")
+        build_synthetic_index(path)
+
+    try:
+        quantise_index(path, rebuild=True)
+        index = LocalVectorIndex(path)
+        queries = sample_queries(path)
+        run(index, queries[:5], None)  # fault pages in before timing
+
+        exact_timings, exact_results = run(index, queries, None)
+        float_mb = os.path.getsize(os.path.join(path, VECTORS_FILE)) / 1e6
+        codes_mb = os.path.getsize(os.path.join(path, CODES_FILE)) / 1e6
+
+        print(f"\n⏱️ top-{TOP_K} over {index.describe_index_stats()['total_vector_count']} vectors, {len(queries)} queries")
+        print(f"{'mode':<16}{'recall@' + str(TOP_K):>10}{'p50 ms':>10}{'p95 ms':>10}{'scanned MB':>12}")
+        print(f"{'float32 exact':<16}{1.0:>10.3f}{np.median(exact_timings) * 1000:>10.2f}"
+              f"{np.percentile(exact_timings, 95) * 1000:>10.2f}{float_mb:>12.1f}")
+        for oversample in OVERSAMPLES:
+            timings, results = run(index, queries, oversample)
+            recall = np.mean([len(r & e) / len(e) for r, e in zip(results, exact_results)])
+            print(f"{'int8 x' + str(oversample):<16}{recall:>10.3f}{np.median(timings) * 1000:>10.2f}"
+                  f"{np.percentile(timings, 95) * 1000:>10.2f}{codes_mb:>12.1f}")
+    finally:
+        if cleanup:
+            shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
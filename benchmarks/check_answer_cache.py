@@ -0,0 +1,76 @@
+# =============================
+# check_answer_cache.py
+# =============================
+# Embeds pairs of questions, caches an answer for the first of each and
+# looks up the second, using the same key, key terms and distance limit as
+# civicgpt_chain. Near misses (different animal, different council) must
+# miss; paraphrases are reported so the distance limit can be tuned.
+# Exits non-zero if any near miss would have reused an answer.
+#
+#   python3 benchmarks/check_answer_cache.py
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from civicgpt_chain import ANSWER_CACHE_MAX_DISTANCE, answer_cache_key, question_terms
+from utilities.clients import EMBEDDING_DIM, get_embeddings
+from utilities.semantic_cache import SemanticAnswerCache
+
+NEAR_MISSES = [
+    ("How do I register my dog?", "How do I register my cat?"),
+    ("When is rubbish collection day in Wellington?", "When is rubbish collection day in Hutt City?"),
+    ("How much are dog registration fees in Auckland?", "How much are dog registration fees in Christchurch?"),
+    ("How do I apply for a building consent?", "How do I apply for a resource consent?"),
+    ("Where can I dump green waste?", "Where can I dump hazardous waste?"),
+]
+PARAPHRASES = [
+    ("How do I register my dog?", "How do I register a dog?"),
+    ("When is rubbish collection day in Wellington?", "What day is rubbish collected in Wellington?"),
+    ("How do I apply for a LIM report?", "How can I apply for a LIM report?"),
+]
+
+
+def check(pairs, cache):
+    embeddings = get_embeddings()
+    results = []
+    for first, second in pairs:
+        first_vector, second_vector = embeddings.embed_documents([first, second])
+        cache.invalidate()
+        cache.store(first_vector, answer_cache_key(first, 5), {"answer": first, "sources": []}, question_terms(first))
+        hit = cache.lookup(second_vector, answer_cache_key(second, 5), question_terms(second)) is not None
+        distance = 1.0 - float(np.dot(first_vector, second_vector)
+                               / (np.linalg.norm(first_vector) * np.linalg.norm(second_vector)))
+        results.append((first, second, distance, hit))
+    return results
+
+
+def report(label, results):
+    print(f"\n{label}")
+    for first, second, distance, hit in results:
+        print(f"  {'HIT ' if hit else 'miss'}  d={distance:.4f}  {first!r} -> {second!r}")
+
+
+def main():
+    cache = SemanticAnswerCache(EMBEDDING_DIM, max_distance=ANSWER_CACHE_MAX_DISTANCE,
+                                generation_path=os.path.join(tempfile.mkdtemp(), "generation"))
+    near_misses = check(NEAR_MISSES, cache)
+    paraphrases = check(PARAPHRASES, cache)
+
+    print(f"🔍 Answer cache (max distance {ANSWER_CACHE_MAX_DISTANCE})")
+    report("Near misses (must miss)", near_misses)
+    report("Paraphrases", paraphrases)
+
+    wrong = [pair for pair in near_misses if pair[3]]
+    if wrong:
+        print(f"\n[!] {len(wrong)} near miss(es) would reuse another question's answer")
+        sys.exit(1)
+    print(f"\n[✅] No near miss hits; {sum(hit for *_, hit in paraphrases)}/{len(paraphrases)} paraphrases hit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# =============================
+# mock_embedding_server.py
+# =============================
+# A stand-in for the OpenAI embeddings endpoint, for benchmarking the
+# ingestion pipeline offline. It enforces its own tokens/requests per
+# minute (answering 429 with Retry-After when exceeded), adds latency
+# proportional to the request size and fails a share of requests with 5xx.
+#
+#   python3 benchmarks/mock_embedding_server.py [port]
+#   OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=mock python3 scripts/embed_documents.py
+
+import sys
+import time
+import base64
+import random
+import asyncio
+
+import numpy as np
+from aiohttp import web
+
+DIM = 1536
+TPM = 1_000_000
+RPM = 3000
+BASE_LATENCY = 0.05  # seconds per request
+LATENCY_PER_1K_TOKENS = 0.002
+ERROR_RATE = 0.02  # share of requests answered with a 500 or 503
+
+
+class MockEmbeddingServer:
+    def __init__(self, tpm=TPM, rpm=RPM, error_rate=ERROR_RATE, seed=0):
+        self.tpm = tpm
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.window = []  # (time, tokens) over the last minute
+        self.counts = {"ok": 0, "429": 0, "5xx": 0}
+
+    def _over_budget(self, tokens):
+        now = time.monotonic()
+        self.window = [(t, n) for t, n in self.window if now - t < 60]
+        used = sum(n for _, n in self.window)
+        if len(self.window) + 1 > self.rpm or used + tokens > self.tpm:
+            oldest = self.window[0][0] if self.window else now
+            return max(0.1, 60 - (now - oldest))
+        self.window.append((now, tokens))
+        return None
+
+    async def embeddings(self, request):
+        body = await request.json()
+        inputs = body["input"]
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        tokens = sum(len(text) // 4 + 1 for text in inputs)
+
+        wait = self._over_budget(tokens)
+        if wait is not None:
+            self.counts["429"] += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status=429, headers={"retry-after": f"{wait:.2f}"},
+            )
+        if self.rng.random() < self.error_rate:
+            self.counts["5xx"] += 1
+            return web.json_response({"error": {"message": "Mock server error", "type": "server_error"}},
+                                     status=self.rng.choice([500, 503]))
+
+        await asyncio.sleep(BASE_LATENCY + LATENCY_PER_1K_TOKENS * tokens / 1000)
+        self.counts["ok"] += 1
+        vectors = np.random.default_rng(len(inputs)).standard_normal((len(inputs), DIM)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        if body.get("encoding_format") == "base64":
+            embeddings = [base64.b64encode(vector.tobytes()).decode() for vector in vectors]
+        else:
+            embeddings = vectors.tolist()
+        return web.json_response({
+            "object": "list",
+            "model": body.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": e} for i, e in enumerate(embeddings)],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def app(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/v1/embeddings", self.embeddings)
+        return app
+
+
+async def start_server(port=0, **kwargs):
+    server = MockEmbeddingServer(**kwargs)
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, server, f"http://127.0.0.1:{port}/v1"
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8089
+    web.run_app(MockEmbeddingServer().app(), host="127.0.0.1", port=port)
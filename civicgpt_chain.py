@@ -1,49 +1,276 @@
 import os
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.chat_models import ChatOpenAI
-from langchain.chains import RetrievalQA
-import os
-from pinecone import Pinecone
-from langchain_community.embeddings import OpenAIEmbeddings
-from openai import OpenAI
+import time
+import asyncio
+from utilities.clients import (
+    CHAT_MODEL, EMBEDDING_DIM, EMBEDDING_MODEL,
+    get_async_openai_client, get_chunk_store, get_embeddings, get_index, get_lexical_index,
+    get_openai_client,
+)
+from utilities.gazetteer import detect_councils
+from utilities.dedup import text_fingerprint
+from utilities.embedding_cache import QueryEmbeddingCache, normalise_question
+from utilities.lexical_index import tokenize
+from utilities.semantic_cache import SemanticAnswerCache
+
+QUERY_EMBEDDING_CACHE_PATH = "data/query_embeddings.sqlite"
+ANSWER_CACHE_MAX_DISTANCE = 0.02
+ANSWER_CACHE_TTL = 24 * 60 * 60  # seconds
+EMBEDDING_BATCH_SIZE = 1000  # inputs per embeddings request (API limit is 2048)
+BATCH_CONCURRENCY = 16
+HYBRID_CANDIDATE_FACTOR = 2  # vector and keyword candidates per final chunk
+RRF_K = 60
+SYSTEM_PROMPT = "You're a helpful assistant answering questions using local government information in New Zealand."
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise ValueError("Please set the OPENAI_API_KEY environment variable.")
 
-def get_civic_answer(question, top_k=5):
-    embeddings = OpenAIEmbeddings()
-    query_vector = embeddings.embed_query(question)
+query_embedding_cache = QueryEmbeddingCache(QUERY_EMBEDDING_CACHE_PATH, EMBEDDING_MODEL)
+answer_cache = SemanticAnswerCache(EMBEDDING_DIM, max_distance=ANSWER_CACHE_MAX_DISTANCE, ttl=ANSWER_CACHE_TTL)
+
+
+def fuse_rankings(*rankings, k=RRF_K):
+    # Reciprocal rank fusion: only ranks matter, so BM25 and cosine scores
+    # never have to be put on the same scale.
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, 1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def retrieve_context(question, query_vector, top_k=5):
+    # Dense search misses exact terms (bylaw numbers, form codes, "LIM
+    # report"), so its candidates are fused with a BM25 keyword search.
+    candidates = top_k * HYBRID_CANDIDATE_FACTOR
+    index = get_index()
 
-    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-    index = pc.Index("localgovgpt")
-    results = index.query(vector=query_vector, top_k=top_k, include_metadata=True)
+    # Questions that name a council or town only search that council's
+    # chunks; if nothing is tagged for it, fall back to every council.
+    council_ids = detect_councils(question)
+    results = lexical = None
+    if council_ids:
+        council_filter = {"council_id": {"$in": council_ids}}
+        results = index.query(vector=query_vector, top_k=candidates, include_metadata=True, filter=council_filter)
+        lexical = get_lexical_index().search(question, top_k=candidates, groups=council_ids)
+        if not results["matches"]:
+            results = lexical = None
+    if results is None:
+        results = index.query(vector=query_vector, top_k=candidates, include_metadata=True)
+        lexical = get_lexical_index().search(question, top_k=candidates)
+
+    vector_metadata = {match["id"]: match["metadata"] for match in results["matches"]}
+    ranked = fuse_rankings(
+        [match["id"] for match in results["matches"]],
+        [chunk_id for chunk_id, _ in lexical],
+    )[:top_k]
 
     top_chunks = []
     sources = set()
+    seen = set()
+
+    # Chunk text comes from the local chunk store; older vectors may still
+    # carry it in their metadata.
+    stored = get_chunk_store().get_many(ranked)
 
-    for match in results["matches"]:
-        metadata = match["metadata"]
-        content = metadata.get("text", "")
+    for chunk_id in ranked:
+        record = stored.get(chunk_id, {})
+        metadata = vector_metadata.get(chunk_id) or record.get("metadata", {})
+        content = metadata.get("text") or record.get("text", "")
         source = metadata.get("source", "unknown")
-        top_chunks.append(content)
         sources.add(source)
+        # Councils sharing boilerplate pages index identical chunks; one copy
+        # in the prompt is enough.
+        fingerprint = text_fingerprint(content)
+        if fingerprint not in seen:
+            seen.add(fingerprint)
+            top_chunks.append(content)
 
     context = "\n---\n".join(top_chunks[:3])
+    return context, list(sources)
+
+
+def answer_cache_key(question, top_k):
+    # "Rubbish day in Wellington" and "rubbish day in Hutt City" embed almost
+    # identically but must not share an answer.
+    return (top_k, tuple(sorted(detect_councils(question))))
+
+
+def question_terms(question):
+    # Key terms the answer cache compares, so "dog registration" never
+    # reuses the answer to "cat registration"
+    return frozenset(tokenize(question))
+
+
+def build_messages(question, context):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Question: {question}\n\nUse the following:\n{context}"}
+    ]
+
+
+def get_civic_answer(question, top_k=5):
+    # Repeat questions skip the embedding round-trip entirely
+    query_vector = query_embedding_cache.embed_query(question, get_embeddings().embed_query)
+
+    # Paraphrases of a recently answered question reuse its answer
+    cached = answer_cache.lookup(query_vector, answer_cache_key(question, top_k), question_terms(question))
+    if cached is not None:
+        return cached
+
+    context, sources = retrieve_context(question, query_vector, top_k)
 
     # ✅ New OpenAI v1.0 style
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = get_openai_client()
     response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "You're a helpful assistant answering questions using local government information in New Zealand."},
-            {"role": "user", "content": f"Question: {question}\n\nUse the following:\n{context}"}
-        ]
+        model=CHAT_MODEL,
+        messages=build_messages(question, context)
     )
 
     answer = response.choices[0].message.content
 
-    return {
+    result = {
+        "answer": answer,
+        "sources": sources
+    }
+    answer_cache.store(query_vector, answer_cache_key(question, top_k), result, question_terms(question))
+    return result
+
+
+def stream_civic_answer(question, top_k=5):
+    """Yield the answer as events: sources first, then tokens, then a summary.
+
+    Events are dicts with a "type" of "sources", "token" or "done". The final
+    "done" event carries the full answer and timings in seconds: retrieval,
+    first_token (time to first token) and total.
+    """
+    start = time.perf_counter()
+    query_vector = query_embedding_cache.embed_query(question, get_embeddings().embed_query)
+
+    cached = answer_cache.lookup(query_vector, answer_cache_key(question, top_k), question_terms(question))
+    if cached is not None:
+        elapsed = time.perf_counter() - start
+        yield {"type": "sources", "sources": cached["sources"]}
+        yield {"type": "token", "text": cached["answer"]}
+        yield {
+            "type": "done",
+            "answer": cached["answer"],
+            "timings": {"retrieval": elapsed, "first_token": elapsed, "total": elapsed},
+        }
+        return
+
+    context, sources = retrieve_context(question, query_vector, top_k)
+    retrieval_time = time.perf_counter() - start
+    yield {"type": "sources", "sources": sources}
+
+    client = get_openai_client()
+    stream = client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=build_messages(question, context),
+        stream=True
+    )
+
+    first_token_time = None
+    parts = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content
+        if not text:
+            continue
+        if first_token_time is None:
+            first_token_time = time.perf_counter() - start
+        parts.append(text)
+        yield {"type": "token", "text": text}
+
+    total_time = time.perf_counter() - start
+    answer = "".join(parts)
+    answer_cache.store(query_vector, answer_cache_key(question, top_k), {"answer": answer, "sources": sources},
+                       question_terms(question))
+    yield {
+        "type": "done",
         "answer": answer,
-        "sources": list(sources)
+        "timings": {
+            "retrieval": retrieval_time,
+            "first_token": first_token_time if first_token_time is not None else total_time,
+            "total": total_time,
+        },
+    }
+
+
+async def aembed_questions(questions):
+    vectors = [query_embedding_cache.get(question) for question in questions]
+
+    # Repeats within the batch share one embedding
+    missing = {}
+    for i, vector in enumerate(vectors):
+        if vector is None:
+            missing.setdefault(normalise_question(questions[i]), []).append(i)
+    pending = list(missing.values())
+
+    client = get_async_openai_client()
+    for start in range(0, len(pending), EMBEDDING_BATCH_SIZE):
+        batch = pending[start:start + EMBEDDING_BATCH_SIZE]
+        response = await client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=[questions[positions[0]] for positions in batch]
+        )
+        for positions, item in zip(batch, response.data):
+            query_embedding_cache.put(questions[positions[0]], item.embedding)
+            for i in positions:
+                vectors[i] = item.embedding
+
+    return [list(map(float, vector)) for vector in vectors]
+
+
+async def _aanswer_from_vector(question, query_vector, top_k):
+    cached = answer_cache.lookup(query_vector, answer_cache_key(question, top_k), question_terms(question))
+    if cached is not None:
+        return cached
+
+    # The Pinecone client is synchronous; its pooled index handle is shared
+    # by the worker threads.
+    context, sources = await asyncio.to_thread(retrieve_context, question, query_vector, top_k)
+
+    response = await get_async_openai_client().chat.completions.create(
+        model=CHAT_MODEL,
+        messages=build_messages(question, context)
+    )
+
+    result = {
+        "answer": response.choices[0].message.content,
+        "sources": sources
     }
+    answer_cache.store(query_vector, answer_cache_key(question, top_k), result, question_terms(question))
+    return result
+
+
+async def aget_civic_answer(question, top_k=5):
+    [query_vector] = await aembed_questions([question])
+    return await _aanswer_from_vector(question, query_vector, top_k)
+
+
+async def abatch_civic_answers(questions, top_k=5, concurrency=BATCH_CONCURRENCY):
+    """Answer many questions with one batched embedding call.
+
+    Retrieval and completions then run concurrently, at most `concurrency` at
+    a time. Results come back in input order; a question that fails gets an
+    "error" key instead of stopping the batch.
+    """
+    query_vectors = await aembed_questions(questions)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer_with_limit(question, query_vector):
+        async with semaphore:
+            try:
+                return await _aanswer_from_vector(question, query_vector, top_k)
+            except Exception as e:
+                print(f"[!] Failed to answer: {question} — {e}")
+                return {"answer": None, "sources": [], "error": str(e)}
+
+    tasks = [answer_with_limit(q, v) for q, v in zip(questions, query_vectors)]
+    return await asyncio.gather(*tasks)
+
+
+def batch_civic_answers(questions, top_k=5, concurrency=BATCH_CONCURRENCY):
+    return asyncio.run(abatch_civic_answers(questions, top_k=top_k, concurrency=concurrency))
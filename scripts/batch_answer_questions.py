@@ -0,0 +1,48 @@
+# =============================
+# batch_answer_questions.py
+# =============================
+# Regression run: answers every question in a text file (one per line) and
+# writes the answers as JSON lines.
+#
+#   python3 scripts/batch_answer_questions.py questions.txt [output.jsonl]
+
+import os
+import sys
+import json
+import time
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from civicgpt_chain import abatch_civic_answers
+
+OUTPUT_PATH = "data/batch_answers.jsonl"
+CONCURRENCY = 16
+
+
+def load_questions(file_path):
+    with open(file_path, "r") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+async def main(input_path, output_path):
+    questions = load_questions(input_path)
+    print(f"[🚀] Answering {len(questions)} questions with max {CONCURRENCY} at a time...")
+
+    start = time.time()
+    results = await abatch_civic_answers(questions, concurrency=CONCURRENCY)
+    duration = time.time() - start
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as f:
+        for question, result in zip(questions, results):
+            f.write(json.dumps({"question": question, **result}) + "\n")
+
+    failed = sum(1 for result in results if "error" in result)
+    print(f"[✅] Answered {len(questions) - failed} questions, {failed} failed, in {duration:.2f} seconds")
+    print(f"[💾] Saved answers to {output_path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python3 scripts/batch_answer_questions.py questions.txt [output.jsonl]")
+    asyncio.run(main(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else OUTPUT_PATH))
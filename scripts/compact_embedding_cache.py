@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utilities.chunk_embedding_cache import text_hash
+from utilities.chunk_shards import ChunkShards
+from utilities.clients import EMBEDDING_CACHE_PATH, SPLIT_DOCS_PATH, get_chunk_embedding_cache
+
+
+def compact(prune=False):
+    # Drops rows superseded by a later write; with --prune, also drops
+    # embeddings of chunks that are no longer in the split shards.
+    keep = None
+    if prune:
+        keep = {text_hash(doc.page_content) for doc in ChunkShards(SPLIT_DOCS_PATH)}
+        print(f"[🔎] Keeping embeddings for {len(keep)} current chunks")
+
+    before, after = get_chunk_embedding_cache().compact(keep)
+    print(f"[🗜️] Compacted {EMBEDDING_CACHE_PATH}: {before} rows -> {after} rows")
+
+
+if __name__ == "__main__":
+    compact(prune="--prune" in sys.argv)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utilities.page_archive import PAGE_ARCHIVE_PATH, PageArchive, archived_councils
+
+
+def compact():
+    # Re-crawled pages leave their old records behind; drop them
+    total_before = total_after = 0
+    for council_id in archived_councils():
+        with PageArchive(os.path.join(PAGE_ARCHIVE_PATH, council_id)) as archive:
+            before, after = archive.compact()
+        total_before += before
+        total_after += after
+    print(f"[🗜️] Compacted {PAGE_ARCHIVE_PATH}: {total_before / 1e6:.1f} MB -> {total_after / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    compact()
@@ -1,45 +1,162 @@
+
 import os
-import pickle
-import uuid
-from pinecone import Pinecone, ServerlessSpec
-from langchain_community.embeddings import OpenAIEmbeddings
+import sys
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utilities.chunk_shards import ChunkShards
+from utilities.clients import (
+    INDEX_MANIFEST_PATH, SPLIT_DOCS_PATH, VECTOR_BACKEND, VECTOR_STORE_PATH, get_chunk_embedding_cache, get_chunk_store,
+    get_lexical_index, get_or_create_index,
+)
+from utilities.embedding_scheduler import EmbeddingScheduler, embed_with_cache
+from utilities.index_manifest import IndexManifest, assign_chunk_ids
+from utilities.semantic_cache import mark_index_rebuilt
+from utilities.vector_index import quantise_index
 
-INPUT_PATH = "data/split_docs.pkl"
 INDEX_NAME = "localgovgpt"
-BATCH_SIZE = 100
+SHARD_CONCURRENCY = 4  # shards embedded at once; the scheduler caps the requests
+SHARD_BATCH_CHUNKS = 2000  # chunks read from a shard per embed/write step
+
+
+def _diff_chunks(docs, full):
+    # Hashes every chunk and queries the manifest; run off the event loop
+    ids = assign_chunk_ids(docs)
+    sources = [doc.metadata.get("source", "unknown") for doc in docs]
+    manifest = IndexManifest(INDEX_MANIFEST_PATH)
+    new_positions, stale_ids = manifest.diff(ids, sources, full=full)
+    manifest.close()
+    return ids, sources, new_positions, stale_ids
+
+
+async def embed_chunks(docs, scheduler, full=False):
+    """Work out which chunks are new and embed them.
+
+    Chunk IDs are derived from (source, ordinal, text), so only chunks the
+    index doesn't already hold get embedded, and chunks that are no longer
+    produced are marked stale. full=True means `docs` is the whole corpus;
+    otherwise only chunks of the pages in `docs` can go stale. Returns a
+    batch for write_chunks(), or None when nothing changed.
+    """
+    ids, sources, new_positions, stale_ids = await asyncio.to_thread(_diff_chunks, docs, full)
+    print(f"[🧮] {len(new_positions)} new or changed chunks, {len(stale_ids)} stale, "
+          f"{len(ids) - len(new_positions)} unchanged")
+    if not new_positions and not stale_ids:
+        return None
+
+    texts = [docs[i].page_content for i in new_positions]
+    embeddings = []
+    if texts:
+        # Chunks whose text was embedded on an earlier run come from the cache
+        print("[🧠] Generating embeddings...")
+        embeddings = await embed_with_cache(texts, get_chunk_embedding_cache(), scheduler)
+
+    return {
+        "ids": [ids[i] for i in new_positions],
+        "sources": [sources[i] for i in new_positions],
+        "texts": texts,
+        "metadatas": [docs[i].metadata for i in new_positions],
+        "embeddings": embeddings,
+        "stale_ids": stale_ids,
+    }
+
+
+async def write_chunks(batch, scheduler):
+    """Store, upsert and delete one batch from embed_chunks()."""
+    index = get_or_create_index(INDEX_NAME)
+    new_ids, texts, metadatas, embeddings = batch["ids"], batch["texts"], batch["metadatas"], batch["embeddings"]
+    source_of = dict(zip(new_ids, batch["sources"]))
+    manifest = IndexManifest(INDEX_MANIFEST_PATH)
+
+    if new_ids:
+        # Text goes to the local chunk store before its vector becomes searchable
+        await asyncio.to_thread(get_chunk_store().put_many, list(zip(new_ids, texts, metadatas)))
+        await asyncio.to_thread(get_lexical_index().add_documents, new_ids, texts,
+                                [metadata.get("council_id") for metadata in metadatas])
+
+        # Each upserted batch is recorded in the manifest as it lands, so a
+        # rerun after a crash only re-sends what didn't make it.
+        def checkpoint(vectors):
+            manifest.apply([(vector[0], source_of[vector[0]]) for vector in vectors], [])
+
+        print(f"[📤] Uploading to {VECTOR_BACKEND} index...")
+        await scheduler.upsert(index, list(zip(new_ids, embeddings, metadatas)), on_batch=checkpoint)
+        print(f"[✅] Uploaded {len(embeddings)} vectors to {VECTOR_BACKEND} index.")
+
+    # Stale chunks go only after their replacements are searchable
+    stale_ids = batch["stale_ids"]
+    if stale_ids:
+        await scheduler.delete(index, stale_ids)
+        await asyncio.to_thread(get_lexical_index().delete, stale_ids)
+        manifest.apply([], stale_ids)
+        print(f"[🗑️] Deleted {len(stale_ids)} stale vectors from {VECTOR_BACKEND} index.")
+    manifest.close()
+
+
+def publish_index():
+    # Makes written vectors visible to the query path
+    if VECTOR_BACKEND == "local":
+        quantise_index(VECTOR_STORE_PATH)
+    mark_index_rebuilt()
+
+
+async def upload_shards(shards, prune=False, scheduler=None):
+    """Embed and upload every shard, streaming each in bounded batches.
 
+    Shards run concurrently under one scheduler. With prune=True the shards
+    are the whole corpus, so pages that none of them produced are deleted.
+    """
+    scheduler = scheduler or EmbeddingScheduler()
+    slots = asyncio.Semaphore(SHARD_CONCURRENCY)
+    seen_sources = set()
+    changed = False
 
-def embed_and_upload():
-    with open(INPUT_PATH, "rb") as f:
-        docs = pickle.load(f)
+    async def upload_shard(shard):
+        nonlocal changed
+        async with slots:
+            # Each batch is decompressed and parsed in a thread, so shards
+            # overlap instead of taking turns on the event loop
+            pages = shards.read_pages(shard, SHARD_BATCH_CHUNKS)
+            try:
+                while True:
+                    docs = await asyncio.to_thread(next, pages, None)
+                    if docs is None:
+                        break
+                    seen_sources.update(doc.metadata.get("source", "unknown") for doc in docs)
+                    batch = await embed_chunks(docs, scheduler)
+                    if batch is not None:
+                        await write_chunks(batch, scheduler)
+                        changed = True
+            finally:
+                pages.close()
 
-    embeddings_model = OpenAIEmbeddings()
-    texts = [doc.page_content for doc in docs]
-    metadatas = [doc.metadata for doc in docs]
-    print("[🧠] Generating embeddings...")
-    embeddings = embeddings_model.embed_documents(texts)
+    await asyncio.gather(*(upload_shard(shard) for shard in shards.shards()))
 
-    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-    if INDEX_NAME not in pc.list_indexes().names():
-        pc.create_index(
-            name=INDEX_NAME,
-            dimension=1536,
-            metric="cosine",
-            spec=ServerlessSpec(cloud="aws", region="us-east-1")
-        )
+    if prune:
+        manifest = IndexManifest(INDEX_MANIFEST_PATH)
+        stale_ids = manifest.ids_outside(seen_sources)
+        manifest.close()
+        if stale_ids:
+            await write_chunks({"ids": [], "sources": [], "texts": [], "metadatas": [], "embeddings": [],
+                                "stale_ids": stale_ids}, scheduler)
+            changed = True
 
-    index = pc.Index(INDEX_NAME)
-    print("[📤] Uploading to Pinecone...")
+    if changed:
+        # Every written batch added a keyword-index segment; merge them for search speed
+        await asyncio.to_thread(get_lexical_index().compact)
+        publish_index()
+    print(f"[📈] {scheduler.summary()}")
 
-    for i in range(0, len(embeddings), BATCH_SIZE):
-        batch = [
-            (str(uuid.uuid4()), embeddings[i], metadatas[i])
-            for i in range(i, min(i + BATCH_SIZE, len(embeddings)))
-        ]
-        index.upsert(vectors=batch)
 
-    print(f"[✅] Uploaded {len(embeddings)} vectors to Pinecone.")
+def embed_and_upload(prune=False):
+    shards = ChunkShards(SPLIT_DOCS_PATH)
+    if prune and not shards.shards():
+        print(f"[!] No shards in {SPLIT_DOCS_PATH} — not pruning the index.")
+        return
+    asyncio.run(upload_shards(shards, prune=prune))
 
 
 if __name__ == "__main__":
-    embed_and_upload()
+    # --prune treats the shards as the whole corpus (as written by
+    # split_documents.py) and deletes vectors for pages no longer in them
+    embed_and_upload(prune="--prune" in sys.argv)
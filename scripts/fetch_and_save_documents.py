@@ -4,23 +4,46 @@
 
 import os
 import asyncio
-import aiohttp
-import trafilatura
 from urllib.parse import urlparse, urljoin
-from bs4 import BeautifulSoup
-import requests
-import fitz
-from lxml import etree
 from tqdm import tqdm
 from datetime import datetime
-import re
+import sys
+import time
+import contextlib
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utilities.gazetteer import get_council_id
+from utilities.extraction import (
+    extract_page, format_pdf_pages, get_domain_root, make_extraction_pool, pdf_page_count, pdf_pages_text, run_cpu,
+    seed_urls_from_html,
+)
+from utilities.loop_monitor import LoopStallMonitor
+from utilities.crawl_scheduler import CrawlScheduler, GLOBAL_CONCURRENCY, PER_HOST_CONCURRENCY
+from utilities.crawl_session import (
+    ConnectionStats, PAGE_TIMEOUT, PDF_TIMEOUT, SITEMAP_TIMEOUT, TIMEOUT, make_crawl_session, retry_delay, should_retry,
+)
+from utilities.crawl_state import CrawlState, content_hash
+from utilities.page_archive import close_page_archives, get_page_archive
+from utilities.sitemaps import SITEMAP_PATHS, SitemapParser, crawl_order
 
-HEADERS = {"User-Agent": "LocalGovGPT-Crawler/1.0 (contact)"}
 MAX_SITEMAPURLS = 500
 MIN_SITEMAP_URLS = 100
 MAX_PAGES = 5
 MAX_SEEDS = 100
-DELAY_BETWEEN_REQUESTS = 2
+SITEMAP_CONCURRENCY = 4  # sub-sitemaps read at once per site
+SITEMAP_CHUNK_BYTES = 64 * 1024
+DELAY_BETWEEN_REQUESTS = 2  # minimum per host; robots.txt Crawl-delay can raise it
+MAX_PDF_BYTES = 50 * 1024 * 1024  # larger PDFs are skipped
+PDF_SPILL_BYTES = 8 * 1024 * 1024  # larger PDFs go to a temp file instead of memory
+PDF_CHUNK_BYTES = 256 * 1024
+PDF_PAGES_PER_TASK = 16  # pages per extraction task for spilled PDFs
+PDF_CONTENT_TYPES = ("application/pdf", "application/x-pdf")
+
+# A downloaded PDF: its bytes, or the temp file they were spilled to
+PdfDownload = namedtuple("PdfDownload", ["data", "path", "size"])
 
 
 
@@ -29,217 +52,418 @@ def load_site_list(file_path="sites_for_crawling.txt"):
         return [line.strip() for line in f if line.strip() and not line.startswith("#")]
 
 
-def parse_sitemap(url, max_urls=MAX_SITEMAPURLS):
-    headers = {"User-Agent": "LocalGovGPT-Crawler/1.0"}
+async def read_sitemap(session, url, scheduler=None, limit=None):
+    # Streams one sitemap (plain or gzipped) through an incremental parser
+    # and stops reading once `limit` page entries have been seen.
+    async def consume(response):
+        parser = SitemapParser()
+        pages, sitemaps = [], []
+        async for chunk in response.content.iter_chunked(SITEMAP_CHUNK_BYTES):
+            new_pages, new_sitemaps = parser.feed(chunk)
+            pages += new_pages
+            sitemaps += new_sitemaps
+            if limit is not None and len(pages) >= limit:
+                return pages[:limit], sitemaps
+        new_pages, new_sitemaps = parser.close()
+        return pages + new_pages, sitemaps + new_sitemaps
+
+    status, result, _ = await _get(session, url, scheduler=scheduler, timeout=SITEMAP_TIMEOUT, consume=consume)
+    if result is None:
+        raise RuntimeError(f"HTTP {status}")
+    return result
+
+
+async def parse_sitemap(session, root_domain, max_urls=MAX_SITEMAPURLS, scheduler=None):
+    """Collect up to max_urls SitemapEntry tuples for a site, in crawl order.
+
+    Starts from the Sitemap: lines in robots.txt, or else the first of the
+    usual locations that answers. Sitemap indexes are followed with a few
+    concurrent fetches, and everything stops once max_urls is reached.
+    """
+    found = {}
+    seen = set()
+    to_read = asyncio.Queue()
+
+    async def visit(url, announce=False):
+        pages, children = await read_sitemap(session, url, scheduler, limit=max_urls - len(found))
+        for entry in pages:
+            if len(found) >= max_urls:
+                break
+            found.setdefault(entry.url, entry)
+        if children:
+            print(f"[📦] Sitemap index found with {len(children)} linked sitemaps")
+        for child in children:
+            to_read.put_nowait(child)
+        return bool(pages or children)
+
+    async def worker():
+        while True:
+            url = await to_read.get()
+            try:
+                if url not in seen and len(found) < max_urls:
+                    seen.add(url)
+                    await visit(url)
+            except Exception as e:
+                print(f"[!] Failed to fetch sub-sitemap: {url} — {e}")
+            finally:
+                to_read.task_done()
+
+    declared = scheduler.sitemaps_for(root_domain) if scheduler else []
+    if declared:
+        print(f"[🤖] robots.txt lists {len(declared)} sitemaps")
+        for url in declared:
+            to_read.put_nowait(url)
+    else:
+        for path in SITEMAP_PATHS:
+            url = urljoin(root_domain, path)
+            seen.add(url)
+            try:
+                if await visit(url):
+                    break
+            except Exception as e:
+                print(f"[!] Failed to parse sitemap at {url}: {e}")
+
+    workers = [asyncio.create_task(worker()) for _ in range(SITEMAP_CONCURRENCY)]
+    await to_read.join()
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    return crawl_order(found.values())[:max_urls]
+
+
+async def _get_once(session, url, scheduler, timeout, binary, attempt, headers, consume):
+    # Every request waits for its host's politeness slot and reports back
+    # how it went, so the scheduler can adapt that host's delay. The time
+    # reported is to the response headers: a large PDF's download says
+    # nothing about how loaded the server is.
+    slot = scheduler.slot(url) if scheduler else contextlib.nullcontext()
+    async with slot:
+        start = time.monotonic()
+        status = retry_after = elapsed = None
+        try:
+            async with session.get(url, timeout=timeout, headers=headers,
+                                   trace_request_ctx={"attempt": attempt}) as response:
+                elapsed = time.monotonic() - start
+                status = response.status
+                retry_after = response.headers.get("Retry-After")
+                validators = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+                if status != 200:
+                    return status, None, validators
+                if consume is not None:
+                    return status, await consume(response), validators
+                return status, await (response.read() if binary else response.text()), validators
+        finally:
+            if scheduler:
+                scheduler.record(url, status, elapsed if elapsed is not None else time.monotonic() - start,
+                                 retry_after)
+
+
+async def _get(session, url, scheduler=None, timeout=None, binary=False, headers=None, consume=None):
+    # Retries go back through the scheduler, so a 429/503 waits out the
+    # host's backed-off delay before the next attempt.
+    attempt = 0
+    while True:
+        try:
+            status, body, validators = await _get_once(session, url, scheduler, timeout, binary, attempt, headers, consume)
+        except Exception as e:
+            if not should_retry(attempt, error=e):
+                raise
+        else:
+            if not should_retry(attempt, status=status):
+                return status, body, validators
+        await asyncio.sleep(retry_delay(attempt))
+        attempt += 1
+
+
+def is_pdf_response(url, response):
+    if response.content_type in PDF_CONTENT_TYPES:
+        return True
+    # Servers often send PDFs as octet-stream; trust the extension then
+    return url.lower().endswith(".pdf") and not response.content_type.startswith("text/")
+
+
+def document_reader(url):
+    """A `consume` for _get that routes on Content-Type.
+
+    Returns ("html", text), ("pdf", PdfDownload) or ("too_large", None).
+    PDFs are streamed once, capped at MAX_PDF_BYTES, and spilled to a temp
+    file past PDF_SPILL_BYTES so worker processes can open them by path.
+    """
+    async def read(response):
+        # The request ran under PAGE_TIMEOUT; the body's budget depends on its type
+        if not is_pdf_response(url, response):
+            return "html", await asyncio.wait_for(response.text(), TIMEOUT.total)
+        if (response.content_length or 0) > MAX_PDF_BYTES:
+            return "too_large", None
+        return await asyncio.wait_for(read_pdf(response), PDF_TIMEOUT.total)
+
+    async def read_pdf(response):
+        buffer, spill, size = bytearray(), None, 0
+        try:
+            async for chunk in response.content.iter_chunked(PDF_CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_PDF_BYTES:
+                    raise OverflowError
+                if spill is None and size > PDF_SPILL_BYTES:
+                    spill = tempfile.NamedTemporaryFile(prefix="crawl_", suffix=".pdf", delete=False)
+                    spill.write(buffer)
+                    buffer = None
+                if spill is not None:
+                    spill.write(chunk)
+                else:
+                    buffer.extend(chunk)
+        except BaseException as e:
+            if spill is not None:
+                spill.close()
+                os.remove(spill.name)
+            if isinstance(e, OverflowError):
+                return "too_large", None
+            raise
+        if spill is not None:
+            spill.close()
+            return "pdf", PdfDownload(None, spill.name, size)
+        return "pdf", PdfDownload(bytes(buffer), None, size)
+
+    return read
+
+
+async def fetch_page(session, url, scheduler=None, headers=None, timeout=None, consume=None):
+    # (status, html, validators); status is 304 when conditional headers matched.
+    # With a `consume`, its result takes the place of the html.
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-
-        tree = etree.fromstring(response.content)
-        root_tag = tree.tag.lower()
-
-        urls = []
-
-        # Case 1: sitemap index (multiple linked sitemaps)
-        if "sitemapindex" in root_tag:
-            sitemap_urls = [loc.text for loc in tree.findall(".//{*}loc")]
-            print(f"[📦] Sitemap index found with {len(sitemap_urls)} linked sitemaps")
-            for sm_url in sitemap_urls:
-                try:
-                    sub_resp = requests.get(sm_url, headers=headers, timeout=10)
-                    sub_resp.raise_for_status()
-                    sub_tree = etree.fromstring(sub_resp.content)
-                    urls += [loc.text for loc in sub_tree.findall(".//{*}loc")]
-                    if len(urls) >= max_urls:
-                        break
-                except Exception as e:
-                    print(f"[!] Failed to fetch sub-sitemap: {sm_url} — {e}")
-
-        # Case 2: regular sitemap
-        elif "urlset" in root_tag:
-            urls = [loc.text for loc in tree.findall(".//{*}loc")]
-
-        return urls[:max_urls]
-
+        return await _get(session, url, scheduler=scheduler, headers=headers, timeout=timeout, consume=consume)
     except Exception as e:
-        print(f"[!] Failed to parse sitemap at {url}: {e}")
-        return []
-
-
-def get_domain_root(url):
-    parsed = urlparse(url)
-    return f"{parsed.scheme}://{parsed.netloc}"
-
-
-def is_same_domain(url, root_domain):
-    return url.startswith(root_domain)
-
-
-def clean_links(base_url, html):
-
-
-    soup = BeautifulSoup(html, "html.parser")
-    links = set()
+        print(f"Error fetching {url}: {e}")
+    return None, None, {}
 
-    for a_tag in soup.find_all("a", href=True):
-        href = a_tag["href"]
-        if href.startswith("mailto:") or href.startswith("tel:"):
-            continue
-        full_url = urljoin(base_url, href)
-        if is_same_domain(full_url, get_domain_root(base_url)):
-            links.add(full_url.split("#")[0])  # strip fragments
 
-    return links
+async def fetch(session, url, scheduler=None):
+    _, html, _ = await fetch_page(session, url, scheduler=scheduler)
+    return html
 
 
-async def fetch(session, url):
+async def fetch_bytes(session, url, timeout=None, raise_errors=False, scheduler=None):
     try:
-        async with session.get(url, headers=HEADERS, timeout=10) as response:
-            if response.status == 200:
-                return await response.text()
+        status, data, _ = await _get(session, url, scheduler=scheduler, timeout=timeout, binary=True)
+        if data is None:
+            raise RuntimeError(f"HTTP {status}")
+        return data
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error fetching {url}: {e}")
     return None
 
-def get_seed_urls_from_homepage(home_url, max_seeds=MAX_SEEDS):
+
+async def load_robots(session, root_domain, scheduler):
+    robots_url = urljoin(root_domain, "/robots.txt")
+    data = await fetch_bytes(session, robots_url, scheduler=scheduler)
+    if data:
+        scheduler.set_robots(robots_url, data.decode("utf-8", errors="replace"))
+        print(f"[🤖] robots.txt for {root_domain}: {scheduler.delay_for(robots_url):.1f}s between requests")
+
+
+async def get_seed_urls_from_homepage(session, home_url, max_seeds=MAX_SEEDS, pool=None, scheduler=None):
     print(f"[🌱] Extracting seed URLs from: {home_url}")
-    headers = {"User-Agent": "LocalGovGPT-Crawler/1.0"}
     try:
-        response = requests.get(home_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        html = response.text
+        html = (await fetch_bytes(session, home_url, raise_errors=True, scheduler=scheduler)).decode("utf-8", errors="replace")
     except Exception as e:
         print(f"[!] Failed to load homepage for seeds: {e}")
         return [home_url]
 
-    soup = BeautifulSoup(html, "html.parser")
-    root = get_domain_root(home_url)
-    found = set()
-
-    for a_tag in soup.find_all("a", href=True):
-        href = a_tag["href"]
-        if href.startswith("mailto:") or href.startswith("tel:"):
-            continue
-
-        full_url = urljoin(home_url, href)
-        if not is_same_domain(full_url, root):
-            continue
-
-        path = urlparse(full_url).path
-        if path in ["/", ""] or "?" in path or "#" in path:
-            continue
-
-        # Shallow internal URLs only
-        if path.count("/") <= 3:
-            found.add(full_url.split("#")[0])
-
-    seeds = list(found)
-    seeds = sorted(seeds)[:max_seeds]
+    seeds = await run_cpu(pool, seed_urls_from_html, home_url, html, max_seeds)
     print(f"[🌿] Found {len(seeds)} seed URLs")
     return seeds if seeds else [home_url]
 
 
-def extract_text_from_pdf(url):
+async def extract_pdf_text(pdf, pool=None):
+    # In-memory PDFs are extracted in one task; spilled ones are split into
+    # page ranges that workers open from the temp file in parallel.
     try:
-        response = requests.get(url, headers=HEADERS, timeout=15)
-        response.raise_for_status()
-        with fitz.open(stream=response.content, filetype="pdf") as doc:
-            text = "\n".join(page.get_text() for page in doc)
-        return text.strip() if text.strip() else None
-    except Exception as e:
-        print(f"[!] Failed to extract PDF: {url} — {e}")
-        return None
+        if pdf.path is None or pool is None:
+            pages = await run_cpu(pool, pdf_pages_text, pdf.path or pdf.data)
+        else:
+            count = await run_cpu(pool, pdf_page_count, pdf.path)
+            parts = await asyncio.gather(*(
+                run_cpu(pool, pdf_pages_text, pdf.path, start, start + PDF_PAGES_PER_TASK)
+                for start in range(0, count, PDF_PAGES_PER_TASK)
+            ))
+            pages = [page for part in parts for page in part]
+        return format_pdf_pages(pages)
+    finally:
+        if pdf.path is not None:
+            os.remove(pdf.path)
+
+
+# Archive writes (gzip + SQLite) run off the event loop, all on one thread,
+# since each council's archive holds a single SQLite connection
+_archive_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive")
 
-def get_council_id(url):
-    domain = urlparse(url).netloc
-    return domain.replace(".", "_")
 
 def save_clean_text(url, text, council_id):
-    os.makedirs(f"data/fetched/{council_id}", exist_ok=True)
-
-    slug = re.sub(r"[^\w\-]+", "_", urlparse(url).path.strip("/"))[:60]
-    if not slug:
-        slug = "homepage"
-
-    timestamp = datetime.utcnow().isoformat()
-    filename = f"data/fetched/{council_id}/{slug}.txt"
-
-    with open(filename, "w") as f:
-        f.write(f"source: {url}\n")
-        f.write(f"scraped_at: {timestamp}Z\n\n")
-        f.write(text.strip())
-
-    print(f"[💾] Saved: {filename}")
-
-
-async def crawl_site(start_url, max_pages, min_sitemap_urls):
+    # Appended to the council's page archive, keyed by the full URL
+    if get_page_archive(council_id).append(url, text):
+        print(f"[💾] Archived: {url}")
+
+
+async def archive_page(url, text, council_id):
+    await asyncio.get_running_loop().run_in_executor(_archive_writer, save_clean_text, url, text, council_id)
+
+
+async def crawl_site(start_url, max_pages, min_sitemap_urls, pool=None, scheduler=None, session=None,
+                     state=None, on_page=None):
+    # Network I/O stays on the event loop; HTML and PDF extraction run in
+    # `pool` (a process pool) so concurrent crawls actually overlap. Request
+    # pacing is left entirely to `scheduler`, and connections to `session`,
+    # both shared across sites. With a CrawlState, pages that haven't changed
+    # since the last crawl are skipped and only changed pages are returned.
+    # With `on_page`, each changed page is awaited into it as soon as it is
+    # extracted and only its URL is kept here; the caller confirms it in
+    # `state` once it has been indexed.
+    if session is None:
+        async with make_crawl_session() as session:
+            return await crawl_site(start_url, max_pages, min_sitemap_urls, pool, scheduler, session, state,
+                                    on_page)
+    scheduler = scheduler or CrawlScheduler(min_delay=DELAY_BETWEEN_REQUESTS)
     visited = set()
+    queued = set()
     texts = []
     failed = []
+    unchanged = []
+    in_flight = 0
 
     council_id = get_council_id(start_url)
     root_domain = get_domain_root(start_url)
-    sitemap_url = urljoin(root_domain, "/sitemap.xml")
+
+    await load_robots(session, root_domain, scheduler)
 
     # Try sitemap
-    crawl_urls = parse_sitemap(sitemap_url, max_urls=max_pages)
+    sitemap = await parse_sitemap(session, root_domain, max_urls=max_pages, scheduler=scheduler)
+    sitemap_lastmod = {entry.url: entry.lastmod for entry in sitemap}
+    crawl_urls = [entry.url for entry in sitemap]  # highest priority, newest first
     used_sitemap = len(crawl_urls) >= min_sitemap_urls
 
     if used_sitemap:
-        print(f"[🧭] Using sitemap: {sitemap_url} ({len(crawl_urls)} URLs)")
+        print(f"[🧭] Using sitemap for {root_domain} ({len(crawl_urls)} URLs)")
     else:
         print(f"[🔄] Sitemap too short or missing — using smart seeds")
-        crawl_urls = get_seed_urls_from_homepage(start_url)
-
-    async with aiohttp.ClientSession() as session:
-        pbar = tqdm(total=min(len(crawl_urls), max_pages), desc=f"Crawling {start_url}")
-        to_visit = set(crawl_urls)
-
-        while to_visit and len(visited) < max_pages:
-            url = to_visit.pop()
-            if url in visited:
-                continue
-
-            html = await fetch(session, url)
-            text = None
-            if not html:
-                if url.lower().endswith(".pdf"):
-                    text = extract_text_from_pdf(url)
-                    if not text:
-                        failed.append((url, "empty_pdf"))
-                        continue
-                else:
-                    failed.append((url, "no_html"))
-                    continue
-            else:
-                text = trafilatura.extract(html)
-                if not text and url.lower().endswith(".pdf"):
-                    text = extract_text_from_pdf(url)
-
+        crawl_urls = await get_seed_urls_from_homepage(session, start_url, pool=pool, scheduler=scheduler)
+
+    pbar = tqdm(total=min(len(crawl_urls), max_pages), desc=f"Crawling {start_url}")
+    to_visit = asyncio.Queue()
+    def enqueue(links):
+        for link in set(links) - queued:
+            queued.add(link)
+            to_visit.put_nowait(link)
+
+    def skip_unchanged(url, previous):
+        unchanged.append(url)
+        visited.add(url)
+        if not used_sitemap:
+            enqueue(previous["links"])
+        pbar.update(1)
+
+    async def crawl_page(url):
+        lastmod = sitemap_lastmod.get(url)
+        previous = state.get(url) if state else None
+        if state and state.unchanged_in_sitemap(previous, lastmod):
+            skip_unchanged(url, previous)
+            return
+
+        headers = state.conditional_headers(previous) if state else None
+        status, document, validators = await fetch_page(session, url, scheduler=scheduler, headers=headers,
+                                                        timeout=PAGE_TIMEOUT, consume=document_reader(url))
+        if status == 304:
+            state.touch(url, lastmod)
+            skip_unchanged(url, previous)
+            return
+
+        kind, body = document or (None, None)
+        text = None
+        links = set()
+        if kind == "too_large":
+            print(f"[!] Skipping PDF over {MAX_PDF_BYTES // (1024 * 1024)} MB: {url}")
+            failed.append((url, "pdf_too_large"))
+            return
+        elif kind == "pdf":
+            try:
+                text = await extract_pdf_text(body, pool)
+            except Exception as e:
+                print(f"[!] Failed to extract PDF: {url} — {e}")
             if not text:
-                print(f"[⚠️] Failed to extract content from: {url}")
-                failed.append((url, "no_extract"))
-            else:
-                save_clean_text(url, text, council_id)  # 🆕 save during crawl
-                texts.append((url, text))
-
-            visited.add(url)
-
+                failed.append((url, "empty_pdf"))
+                return
+        elif not body:
+            failed.append((url, "no_html"))
+            return
+        else:
             # Only expand internal links if we're not using sitemap
-            if not used_sitemap and html:
-                new_links = clean_links(url, html)
-                to_visit.update(new_links - visited)
-
-            pbar.update(1)
-            await asyncio.sleep(DELAY_BETWEEN_REQUESTS)
-
-        pbar.close()
+            text, links = await run_cpu(pool, extract_page, url, body, not used_sitemap)
+
+        if not text:
+            print(f"[⚠️] Failed to extract content from: {url}")
+            failed.append((url, "no_extract"))
+        else:
+            text_hash = content_hash(text)
+            changed = not (previous and previous["content_hash"] == text_hash)
+            if state:
+                # A changed page handed to on_page is only confirmed once the
+                # caller has indexed it (CrawlState.confirm)
+                state.record(url, council_id, validators.get("etag"), validators.get("last_modified"),
+                             lastmod, text_hash, links, confirmed=not (changed and on_page))
+            if not changed:
+                unchanged.append(url)
+            else:
+                await archive_page(url, text, council_id)  # 🆕 save during crawl
+                if on_page:
+                    await on_page((url, text))
+                    texts.append((url, None))
+                else:
+                    texts.append((url, text))
+
+        visited.add(url)
+        enqueue(links)
+        pbar.update(1)
+
+    async def worker():
+        nonlocal in_flight
+        while True:
+            url = await to_visit.get()
+            try:
+                if len(visited) + in_flight < max_pages and scheduler.can_fetch(url):
+                    in_flight += 1
+                    try:
+                        await crawl_page(url)
+                    except Exception as e:
+                        # One bad page must not take the worker (and the crawl) down
+                        print(f"[!] Failed to crawl {url}: {e.__class__.__name__}: {e}")
+                        failed.append((url, "error"))
+                    finally:
+                        in_flight -= 1
+            finally:
+                to_visit.task_done()
+
+    enqueue(crawl_urls)
+
+    # A couple of workers per site; the scheduler decides when each
+    # request may actually start.
+    workers = [asyncio.create_task(worker()) for _ in range(PER_HOST_CONCURRENCY)]
+    await to_visit.join()
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+    pbar.close()
 
     # Save logs
     save_crawl_log(texts, start_url)
     save_failed_log(failed, start_url)
 
-    print(f"[✅] Finished crawling {start_url}. {len(texts)} pages extracted, {len(failed)} failed.")
+    print(f"[✅] Finished crawling {start_url}. {len(texts)} pages extracted, "
+          f"{len(unchanged)} unchanged, {len(failed)} failed.")
     return texts
 
 def save_crawl_log(pages, base_url):
@@ -270,22 +494,41 @@ def save_failed_log(failed_urls, base_url):
     print(f"[🧾] Saved failed crawl log: {filename}")
 
 
-async def fetch_and_save_all():
-    site_list = load_site_list()
-    summary_log = []
-    start_time = datetime.utcnow()
-
-    semaphore = asyncio.Semaphore(10)
+async def crawl_all_sites(site_list, max_pages, min_sitemap_urls, pool=None, stats=None, state=None,
+                          on_page=None):
+    # Every site starts at once; one scheduler enforces per-host politeness
+    # and the global request budget, and one session pools the connections.
+    scheduler = CrawlScheduler(concurrency=GLOBAL_CONCURRENCY, min_delay=DELAY_BETWEEN_REQUESTS)
 
-    async def crawl_with_limit(site):
-        async with semaphore:
+    async with make_crawl_session(stats) as session:
+        async def crawl(site):
             return {
                 "site": site,
-                "pages": await crawl_site(site, max_pages=MAX_PAGES, min_sitemap_urls=MIN_SITEMAP_URLS)
+                "pages": await crawl_site(site, max_pages=max_pages, min_sitemap_urls=min_sitemap_urls,
+                                          pool=pool, scheduler=scheduler, session=session,
+                                          state=state, on_page=on_page)
             }
 
-    tasks = [crawl_with_limit(site) for site in site_list]
-    results = await asyncio.gather(*tasks)
+        tasks = [crawl(site) for site in site_list]
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            await asyncio.get_running_loop().run_in_executor(_archive_writer, close_page_archives)
+
+
+async def fetch_and_save_all(full=False):
+    site_list = load_site_list()
+    summary_log = []
+    start_time = datetime.utcnow()
+
+    monitor = LoopStallMonitor().start()
+    stats = ConnectionStats()
+    with make_extraction_pool() as pool, CrawlState(full=full) as state:
+        results = await crawl_all_sites(site_list, MAX_PAGES, MIN_SITEMAP_URLS, pool=pool, stats=stats,
+                                        state=state)
+    await monitor.stop()
+    print(f"[⏱️] Crawl {monitor.summary()}")
+    print(f"[🔌] HTTP: {stats.summary()}")
 
     all_pages = []
     for result in results:
@@ -326,9 +569,12 @@ async def fetch_and_save_all():
         f.write(f"  ✅ Total scraped: {total_success}\n")
         f.write(f"  ⚠️  Total failed : {total_failed}\n")
         f.write(f"  ⏱️  Duration     : {duration:.2f} seconds\n")
+        f.write(f"  🧵 Event loop   : {monitor.summary()}\n")
+        f.write(f"  🔌 Connections  : {stats.summary()}\n")
 
     print(f"\n[📋] Crawl complete. Summary saved to {log_path}")
 
 if __name__ == "__main__":
-    asyncio.run(fetch_and_save_all())
+    # --full ignores the crawl state and refetches every page
+    asyncio.run(fetch_and_save_all(full="--full" in sys.argv))
 
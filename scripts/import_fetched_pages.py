@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utilities.gazetteer import get_council_id
+from utilities.page_archive import PAGE_ARCHIVE_PATH, close_page_archives, get_page_archive
+
+FETCHED_DIR = "data/fetched"
+
+
+def import_fetched_pages(fetched_dir=FETCHED_DIR):
+    # One-off move of the old one-.txt-per-page layout into the page archive
+    imported = skipped = 0
+    for root, _, files in os.walk(fetched_dir):
+        for file in sorted(files):
+            if not file.endswith(".txt"):
+                continue
+            with open(os.path.join(root, file), "r") as f:
+                lines = f.readlines()
+            if not lines or not lines[0].startswith("source:"):
+                skipped += 1
+                continue
+            source = lines[0].split(":", 1)[1].strip()
+            scraped_at = lines[1].split(":", 1)[1].strip() if len(lines) > 1 and lines[1].startswith("scraped_at:") else None
+            if get_page_archive(get_council_id(source)).append(source, "".join(lines[2:]), scraped_at):
+                imported += 1
+    close_page_archives()
+    print(f"[📦] Imported {imported} pages into {PAGE_ARCHIVE_PATH} ({skipped} files without a source line)")
+
+
+if __name__ == "__main__":
+    import_fetched_pages(sys.argv[1] if len(sys.argv) > 1 else FETCHED_DIR)
@@ -3,40 +3,112 @@
 # =============================
 
 import os
-import pickle
+import sys
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from langchain.docstore.document import Document
-from langchain.text_splitter import TokenTextSplitter
 
-RAW_DATA_DIR = "data/fetched"
-OUTPUT_PATH = "data/split_docs.pkl"
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utilities.chunk_shards import ChunkShards, shard_name
+from utilities.chunker import split_document
+from utilities.clients import SPLIT_DOCS_PATH
+from utilities.dedup import dedupe_pages
+from utilities.gazetteer import get_council_id
+from utilities.page_archive import PAGE_ARCHIVE_PATH, PageArchive, archived_councils
 
+SPLIT_WORKERS = os.cpu_count() or 4
+PAGE_STATE_SUFFIX = ".pages.json"  # per-shard {url: content hash} as last split
+CHUNK_LOCATION_KEYS = ("start_index", "end_index", "page", "page_end")  # kept when a chunk is reused
 
-def load_fetched_documents():
-    documents = []
-    for root, _, files in os.walk(RAW_DATA_DIR):
-        for file in files:
-            if file.endswith(".txt"):
-                path = os.path.join(root, file)
-                with open(path, "r") as f:
-                    lines = f.readlines()
-                    source = lines[0].split(":", 1)[1].strip() if lines[0].startswith("source:") else "unknown"
-                    content = "".join(lines[2:])  # skip source and scraped_at
-                    documents.append(Document(page_content=content, metadata={"source": source}))
-    return documents
 
+def load_page_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-def split_documents():
-    docs = load_fetched_documents()
-    splitter = TokenTextSplitter(chunk_size=500, chunk_overlap=50)
-    chunks = splitter.split_documents(docs)
 
-    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
-    with open(OUTPUT_PATH, "wb") as f:
-        pickle.dump(chunks, f)
+def split_council(council_id, shards_path=SPLIT_DOCS_PATH, full=False, archive_root=PAGE_ARCHIVE_PATH):
+    """Split one council's archived pages into its shard. Runs in a worker process.
 
-    print(f"[💾] Saved {len(chunks)} split documents to {OUTPUT_PATH}")
+    Nothing is read when the archive index shows the same pages with the
+    same content hashes as last time. Otherwise every page is scanned for
+    deduplication, but only pages whose hash changed are re-tokenised; the
+    rest reuse their old chunks. Returns (shard, chunks written, pages
+    re-split, duplicates dropped), with chunks written None when the shard
+    was left alone.
+    """
+    shards = ChunkShards(shards_path)
+    shard = shard_name(council_id)
+    state_path = os.path.join(shards_path, shard + PAGE_STATE_SUFFIX)
+    previous = {} if full or shard not in shards.shards() else load_page_state(state_path)
 
+    with PageArchive(os.path.join(archive_root, council_id)) as archive:
+        hashes = archive.hashes()
+        if previous and previous == hashes:
+            return shard, None, 0, 0
+        changed = {url for url, digest in hashes.items() if previous.get(url) != digest}
+        pages = [(page.url, page.text) for page in archive.scan()]
+
+    # Same page under several URLs (query strings, print views) is kept once,
+    # within each council so council-filtered retrieval still finds it.
+    pages, aliases, dropped = dedupe_pages(pages, scope=get_council_id)
+
+    reused = {}
+    if previous:
+        for doc in shards.read(shard):
+            if doc.metadata.get("source") not in changed:
+                reused.setdefault(doc.metadata.get("source"), []).append(doc)
+
+    resplit = 0
+
+    def chunks():
+        nonlocal resplit
+        for source, content in pages:
+            metadata = {"source": source, "council_id": get_council_id(source)}
+            if source in aliases:
+                metadata["aliases"] = aliases[source]
+            if source in reused:
+                for doc in reused[source]:
+                    located = {key: doc.metadata[key] for key in CHUNK_LOCATION_KEYS if key in doc.metadata}
+                    yield Document(page_content=doc.page_content, metadata={**metadata, **located})
+            else:
+                resplit += 1
+                yield from split_document(Document(page_content=content, metadata=metadata))
+
+    count = shards.replace(shard, chunks())
+    # Written after the shard, so a crash in between only costs a re-split
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(hashes, f)
+    os.replace(tmp_path, state_path)
+    return shard, count, resplit, dropped["exact"] + dropped["near"]
 
-if __name__ == "__main__":
-    split_documents()
 
+def split_documents(full=False, workers=SPLIT_WORKERS, archive_root=PAGE_ARCHIVE_PATH):
+    councils = archived_councils(archive_root)
+
+    # One council per task: dedup and shards are per council anyway
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(split_council, councils, repeat(SPLIT_DOCS_PATH), repeat(full),
+                                repeat(archive_root)))
+
+    shards = ChunkShards(SPLIT_DOCS_PATH)
+    current = {shard for shard, *_ in results}
+    for shard in set(shards.shards()) - current:
+        shards.remove(shard)
+        state_path = os.path.join(SPLIT_DOCS_PATH, shard + PAGE_STATE_SUFFIX)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+    written = [result for result in results if result[1] is not None]
+    print(f"[🧹] Dropped {sum(result[3] for result in written)} duplicate pages")
+    print(f"[💾] Re-split {sum(result[2] for result in written)} pages; rewrote {len(written)} of "
+          f"{len(results)} shards ({sum(result[1] for result in written)} chunks) in {SPLIT_DOCS_PATH}")
+
+
+if __name__ == "__main__":
+    # --full ignores the saved page state and re-splits every page
+    split_documents(full="--full" in sys.argv)
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from utilities.pipeline import STOP, pass_failure, run_batcher, run_stage, run_stages
+
+
+class EmbedError(Exception):
+    pass
+
+
+def run_pipeline(fail_in):
+    # The crawl -> split -> batch -> embed -> write topology of
+    # crawl_and_build_vector_store.main, with small queues so a stalled
+    # stage blocks its producers quickly
+    pages, docs, batches, embedded = (asyncio.Queue(2) for _ in range(4))
+
+    async def crawl():
+        try:
+            for n in range(100):
+                if fail_in == "crawl" and n == 5:
+                    raise EmbedError("crawl")
+                await pages.put(n)
+        except Exception as e:
+            pass_failure(pages, e)
+            raise
+        await pages.put(STOP)
+        return "crawled"
+
+    async def step(name):
+        async def fn(item):
+            if name == fail_in:
+                raise EmbedError(name)
+            await asyncio.sleep(0)
+            return item if name != "split" else [item]
+        return fn
+
+    async def main():
+        return await run_stages(
+            crawl(),
+            run_stage("split", await step("split"), pages, docs, workers=2),
+            run_batcher(docs, batches, 3, max_wait=0.01),
+            run_stage("embed", await step("embed"), batches, embedded, workers=2),
+            run_stage("write", await step("write"), embedded),
+        )
+
+    return asyncio.run(asyncio.wait_for(main(), timeout=5))
+
+
+def test_pipeline_completes():
+    results, *stages = run_pipeline(fail_in=None)
+    assert results == "crawled"
+    assert stages[-1].items == 34  # 100 pages in batches of 3
+
+
+@pytest.mark.parametrize("stage", ["crawl", "split", "embed", "write"])
+def test_failing_stage_ends_run_with_its_error(stage):
+    with pytest.raises(EmbedError, match=stage):
+        run_pipeline(fail_in=stage)
+
+
+def test_run_stage_passes_failure_downstream():
+    async def main():
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        for item in (1, 2, STOP):
+            inbox.put_nowait(item)
+
+        async def fn(item):
+            raise EmbedError("boom")
+
+        with pytest.raises(EmbedError):
+            await run_stage("embed", fn, inbox, outbox, workers=2)
+        return outbox.get_nowait()
+
+    failed = asyncio.run(main())
+    assert isinstance(failed.error, EmbedError)
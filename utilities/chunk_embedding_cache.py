@@ -0,0 +1,109 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+VECTORS_FILE = "vectors.f32"
+KEYS_FILE = "keys.idx"
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkEmbeddingCache:
+    """Append-only on-disk cache of chunk embeddings keyed by (model, text hash).
+
+    vectors.f32 holds raw float32 rows back to back and is memory-mapped for
+    reads. keys.idx has a tab-separated line per row (model, SHA-256 of the
+    chunk text, row number), written after the row itself, and is loaded
+    into a dict. Re-adding a key appends a new row that wins over the old
+    one; compact() rewrites both files without the dead rows.
+    """
+
+    def __init__(self, path, model, dim):
+        self.path = path
+        self.model = model
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._keys_offset = 0
+        self._n_rows = 0
+        self._vectors = None
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _refresh(self):
+        keys_path = self._file(KEYS_FILE)
+        if not os.path.exists(keys_path) or os.path.getsize(keys_path) <= self._keys_offset:
+            return
+
+        with open(keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # ignore a line that is still being written
+        self._keys_offset += end
+        for line in data[:end].decode().splitlines():
+            model, digest, row = line.split("\t")
+            self._rows[(model, digest)] = int(row)
+            self._n_rows = max(self._n_rows, int(row) + 1)
+
+        self._vectors = np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode="r",
+                                  shape=(self._n_rows, self.dim))
+
+    def lookup(self, hashes):
+        """Return ({position: vector} for cached hashes, positions missing)."""
+        with self._lock:
+            self._refresh()
+            found, missing = {}, []
+            for position, digest in enumerate(hashes):
+                row = self._rows.get((self.model, digest))
+                if row is None:
+                    missing.append(position)
+                else:
+                    found[position] = np.array(self._vectors[row])
+            return found, missing
+
+    def put_many(self, hashes, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            self._refresh()
+            with open(self._file(VECTORS_FILE), "ab") as f:
+                first_row = f.tell() // (4 * self.dim)
+                f.truncate(first_row * 4 * self.dim)  # drop a torn row from a crashed write
+                f.write(vectors.tobytes())
+            with open(self._file(KEYS_FILE), "a") as f:
+                f.writelines(f"{self.model}\t{digest}\t{first_row + i}\n" for i, digest in enumerate(hashes))
+            self._refresh()
+
+    def compact(self, keep_hashes=None):
+        """Rewrite the cache with one row per key, optionally only `keep_hashes`.
+
+        Returns (rows before, rows after).
+        """
+        with self._lock:
+            self._refresh()
+            if self._vectors is None:
+                return 0, 0
+            keep = set(keep_hashes) if keep_hashes is not None else None
+            live = sorted(
+                (row, key) for key, row in self._rows.items()
+                if keep is None or key[1] in keep
+            )
+
+            tmp_vectors = self._file(VECTORS_FILE + ".tmp")
+            tmp_keys = self._file(KEYS_FILE + ".tmp")
+            with open(tmp_vectors, "wb") as vf, open(tmp_keys, "w") as kf:
+                for new_row, (row, (model, digest)) in enumerate(live):
+                    vf.write(np.asarray(self._vectors[row]).tobytes())
+                    kf.write(f"{model}\t{digest}\t{new_row}\n")
+            os.replace(tmp_vectors, self._file(VECTORS_FILE))
+            os.replace(tmp_keys, self._file(KEYS_FILE))
+
+            before = self._n_rows
+            self._rows, self._keys_offset, self._n_rows, self._vectors = {}, 0, 0, None
+            self._refresh()
+            return before, len(live)
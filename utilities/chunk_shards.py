@@ -0,0 +1,101 @@
+import os
+import json
+import zlib
+import struct
+import re
+
+from langchain.docstore.document import Document
+
+SHARD_SUFFIX = ".chunks"
+HEADER = struct.Struct(">I")  # record length, big-endian
+COMPRESSION_LEVEL = 6
+
+
+def shard_name(key):
+    return re.sub(r"[^\w\-]+", "_", key or "unknown")
+
+
+class ChunkShards:
+    """Split documents on disk as sharded, length-prefixed record files.
+
+    One file per shard (normally per council). Each record is a 4-byte
+    length followed by a zlib-compressed JSON {"text", "metadata"}, so a
+    shard can be appended to, and read back one record at a time. A record
+    cut short by a crash is ignored by readers. replace() rewrites a whole
+    shard atomically, which is how a council is re-split.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _file(self, shard):
+        return os.path.join(self.path, shard + SHARD_SUFFIX)
+
+    def shards(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name[:-len(SHARD_SUFFIX)] for name in os.listdir(self.path) if name.endswith(SHARD_SUFFIX))
+
+    def _write(self, f, docs):
+        count = 0
+        for doc in docs:
+            payload = zlib.compress(
+                json.dumps({"text": doc.page_content, "metadata": doc.metadata}).encode(),
+                COMPRESSION_LEVEL,
+            )
+            f.write(HEADER.pack(len(payload)))
+            f.write(payload)
+            count += 1
+        return count
+
+    def append(self, shard, docs):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file(shard), "ab") as f:
+            return self._write(f, docs)
+
+    def replace(self, shard, docs):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self._file(shard) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            count = self._write(f, docs)
+        os.replace(tmp_path, self._file(shard))
+        return count
+
+    def remove(self, shard):
+        if os.path.exists(self._file(shard)):
+            os.remove(self._file(shard))
+
+    def read(self, shard):
+        """Yield the shard's Documents lazily, in the order they were written."""
+        with open(self._file(shard), "rb") as f:
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return
+                (length,) = HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    return  # torn final record
+                record = json.loads(zlib.decompress(payload))
+                yield Document(page_content=record["text"], metadata=record["metadata"])
+
+    def read_pages(self, shard, max_chunks):
+        """Yield lists of Documents of about max_chunks, never splitting a page.
+
+        Chunks of one source are written together, so every list holds all
+        of the chunks of each page in it.
+        """
+        group, source = [], None
+        for doc in self.read(shard):
+            doc_source = doc.metadata.get("source")
+            if len(group) >= max_chunks and doc_source != source:
+                yield group
+                group = []
+            group.append(doc)
+            source = doc_source
+        if group:
+            yield group
+
+    def __iter__(self):
+        for shard in self.shards():
+            yield from self.read(shard)
@@ -0,0 +1,92 @@
+import os
+import json
+import mmap
+import zlib
+import threading
+
+DATA_FILE = "chunks.dat"
+INDEX_FILE = "chunks.idx"
+COMPRESSION_LEVEL = 6
+
+
+class ChunkStore:
+    """Append-only, compressed store of chunk text and metadata by vector ID.
+
+    chunks.dat holds one zlib-compressed JSON record per chunk, back to back.
+    chunks.idx is a tab-separated line per record (vector ID, offset, length)
+    and is loaded into a dict, so a lookup is one dict hit plus one slice of
+    the memory-mapped data file. Writing a chunk under an existing ID appends
+    a new record that supersedes the old one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offsets = {}
+        self._index_offset = 0
+        self._data = None
+        self._data_size = 0
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _refresh(self):
+        index_path = self._file(INDEX_FILE)
+        if not os.path.exists(index_path) or os.path.getsize(index_path) <= self._index_offset:
+            return
+
+        with open(index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # ignore a line that is still being written
+        self._index_offset += end
+        for line in data[:end].decode().splitlines():
+            chunk_id, offset, length = line.rsplit("\t", 2)
+            self._offsets[chunk_id] = (int(offset), int(length))
+
+        # Index lines are written after their records, so the data file is
+        # at least as long as every offset we now know about.
+        size = os.path.getsize(self._file(DATA_FILE))
+        if size != self._data_size:
+            with open(self._file(DATA_FILE), "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._data_size = size
+
+    def put_many(self, records):
+        """Append (chunk_id, text, metadata) records."""
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            index_lines = []
+            with open(self._file(DATA_FILE), "ab") as f:
+                for chunk_id, text, metadata in records:
+                    payload = zlib.compress(
+                        json.dumps({"text": text, "metadata": metadata}).encode(),
+                        COMPRESSION_LEVEL,
+                    )
+                    index_lines.append(f"{chunk_id}\t{f.tell()}\t{len(payload)}\n")
+                    f.write(payload)
+            with open(self._file(INDEX_FILE), "a") as f:
+                f.writelines(index_lines)
+            self._refresh()
+
+    def get_many(self, chunk_ids):
+        """Return {chunk_id: {"text": ..., "metadata": ...}} for the IDs found."""
+        with self._lock:
+            self._refresh()
+            data, offsets = self._data, self._offsets
+            found = {}
+            for chunk_id in chunk_ids:
+                location = offsets.get(chunk_id)
+                if location is None:
+                    continue
+                offset, length = location
+                found[chunk_id] = json.loads(zlib.decompress(data[offset:offset + length]))
+            return found
+
+    def get(self, chunk_id):
+        return self.get_many([chunk_id]).get(chunk_id)
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._offsets)
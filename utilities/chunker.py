@@ -0,0 +1,92 @@
+import re
+from bisect import bisect_right
+
+import tiktoken
+from langchain.docstore.document import Document
+
+# TokenTextSplitter's defaults, so chunk boundaries (and so chunk IDs) match
+# what earlier runs uploaded
+ENCODING_NAME = "gpt2"
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+# Page markers written by extraction.format_pdf_pages at the start of each PDF page
+PAGE_MARKER = re.compile(r"^\[Page (\d+)\]$", re.MULTILINE)
+
+_encodings = {}
+_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+
+def get_encoding(name=ENCODING_NAME):
+    if name not in _encodings:
+        _encodings[name] = tiktoken.get_encoding(name)
+    return _encodings[name]
+
+
+def token_windows(n_tokens, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """(start, end) token offsets of each chunk, stepping chunk_size - overlap."""
+    start = 0
+    while start < n_tokens:
+        end = min(start + chunk_size, n_tokens)
+        yield start, end
+        if end == n_tokens:
+            return
+        start += chunk_size - chunk_overlap
+
+
+def chunk_text(text, encoding=None, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Split text into overlapping token windows.
+
+    The text is encoded once. For ASCII text each window is sliced out of
+    the original string by character offset, which is exactly what decoding
+    its tokens would give. Otherwise a window can end partway through a
+    character, so its text is decoded from its tokens as TokenTextSplitter
+    did (a split character becomes U+FFFD), keeping chunk IDs stable; the
+    offsets still locate it in the original string.
+    Returns (chunk, start_char, end_char) tuples.
+    """
+    encoding = encoding or get_encoding()
+    tokens = encoding.encode_ordinary(text)
+    data = text.encode("utf-8")
+    ascii_only = len(data) == len(text)
+
+    windows = list(token_windows(len(tokens), chunk_size, chunk_overlap))
+
+    # Character offsets are needed only at window boundaries; walk them in
+    # order, decoding just the tokens in between
+    offsets = {}
+    byte_offset = chars_before = previous = 0
+    for boundary in sorted({index for window in windows for index in window}):
+        end = byte_offset + len(encoding.decode_bytes(tokens[previous:boundary]))
+        if ascii_only:
+            offsets[boundary] = end
+        else:
+            # Characters = bytes that aren't UTF-8 continuation bytes; a
+            # boundary inside a character moves back to its start
+            chars_before += len(data[byte_offset:end].translate(None, _CONTINUATION_BYTES))
+            inside = end < len(data) and 0x80 <= data[end] < 0xC0
+            offsets[boundary] = chars_before - inside
+        byte_offset, previous = end, boundary
+
+    if ascii_only:
+        return [(text[offsets[start]:offsets[end]], offsets[start], offsets[end]) for start, end in windows]
+    return [(encoding.decode(tokens[start:end]), offsets[start], offsets[end]) for start, end in windows]
+
+
+def split_document(doc, encoding=None, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    # start_index/end_index locate each chunk in the page text, for citations;
+    # PDF chunks also get the page they start on (and end on, if different)
+    pages = [(match.start(), int(match.group(1))) for match in PAGE_MARKER.finditer(doc.page_content)]
+    page_starts = [start for start, _ in pages]
+    documents = []
+    for chunk, start, end in chunk_text(doc.page_content, encoding, chunk_size, chunk_overlap):
+        metadata = {**doc.metadata, "start_index": start, "end_index": end}
+        if pages:
+            # A chunk starting just before a marker belongs to that page
+            first = bisect_right(page_starts, start + len(chunk) - len(chunk.lstrip())) - 1
+            last = bisect_right(page_starts, end - 1) - 1
+            metadata["page"] = pages[max(first, 0)][1]
+            if last > first:
+                metadata["page_end"] = pages[last][1]
+        documents.append(Document(page_content=chunk, metadata=metadata))
+    return documents
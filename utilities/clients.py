@@ -0,0 +1,162 @@
+import os
+import asyncio
+import threading
+import weakref
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+from pinecone import Pinecone, ServerlessSpec
+from langchain_community.embeddings import OpenAIEmbeddings
+
+from utilities.chunk_embedding_cache import ChunkEmbeddingCache
+from utilities.chunk_store import ChunkStore
+from utilities.lexical_index import LexicalIndex
+from utilities.vector_index import LocalVectorIndex
+
+INDEX_NAME = "localgovgpt"
+# "pinecone" queries the hosted index; "local" searches the memory-mapped
+# copy in VECTOR_STORE_PATH written by the ingestion scripts.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "data/vector_store")
+# Chunk text lives here rather than in vector metadata
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", "data/chunk_store")
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "data/lexical_index")
+# Split chunks, one length-prefixed record shard per council
+SPLIT_DOCS_PATH = os.getenv("SPLIT_DOCS_PATH", "data/split_docs")
+# Chunk embeddings by (model, text hash), so unchanged text is never re-embedded
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache")
+# Chunk IDs already uploaded to each backend, so re-indexing only sends the delta
+INDEX_MANIFEST_PATH = os.getenv("INDEX_MANIFEST_PATH", f"data/index_manifest_{VECTOR_BACKEND}.sqlite")
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_DIM = 1536
+CHAT_MODEL = "gpt-3.5-turbo"
+
+# One pooled HTTP client is shared by the OpenAI chat and embedding calls, so
+# every Streamlit session reuses the same keep-alive connections.
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_EXPIRY = 60  # seconds
+REQUEST_TIMEOUT = 30  # seconds
+
+_lock = threading.Lock()
+_clients = {}
+# Async HTTP connections belong to the event loop that opened them
+_async_openai_clients = weakref.WeakKeyDictionary()
+
+
+def _get_or_create(name, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+
+def _http_limits():
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def get_http_client():
+    return _get_or_create("http", lambda: httpx.Client(
+        limits=_http_limits(),
+        timeout=REQUEST_TIMEOUT,
+    ))
+
+
+def get_openai_client():
+    return _get_or_create("openai", lambda: OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=get_http_client(),
+    ))
+
+
+def get_async_openai_client():
+    loop = asyncio.get_running_loop()
+    client = _async_openai_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.AsyncClient(limits=_http_limits(), timeout=REQUEST_TIMEOUT),
+        )
+        _async_openai_clients[loop] = client
+    return client
+
+
+def get_embeddings():
+    return _get_or_create("embeddings", lambda: OpenAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        http_client=get_http_client(),
+    ))
+
+
+def get_pinecone():
+    return _get_or_create("pinecone", lambda: Pinecone(
+        api_key=os.getenv("PINECONE_API_KEY"),
+        connection_pool_maxsize=MAX_CONNECTIONS,
+    ))
+
+
+def get_index(index_name=INDEX_NAME):
+    # Resolve the index host once; pc.Index(name) would look it up again on
+    # every call.
+    def build():
+        if VECTOR_BACKEND == "local":
+            return LocalVectorIndex(VECTOR_STORE_PATH, dim=EMBEDDING_DIM)
+        pc = get_pinecone()
+        host = pc.describe_index(index_name).host
+        return pc.Index(host=host)
+
+    return _get_or_create(f"index:{index_name}", build)
+
+
+def get_chunk_store():
+    return _get_or_create("chunk_store", lambda: ChunkStore(CHUNK_STORE_PATH))
+
+
+def get_lexical_index():
+    return _get_or_create("lexical_index", lambda: LexicalIndex(LEXICAL_INDEX_PATH))
+
+
+def get_chunk_embedding_cache():
+    return _get_or_create(
+        "chunk_embedding_cache",
+        lambda: ChunkEmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_MODEL, EMBEDDING_DIM),
+    )
+
+
+def get_or_create_index(index_name=INDEX_NAME):
+    # Ingestion entry point: creates the Pinecone index on first use. The
+    # local backend creates its files on the first upsert.
+    if VECTOR_BACKEND != "local":
+        pc = get_pinecone()
+        if index_name not in pc.list_indexes().names():
+            pc.create_index(
+                name=index_name,
+                dimension=EMBEDDING_DIM,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1")
+            )
+    return get_index(index_name)
+
+
+def warm_up(index_name=INDEX_NAME):
+    """Build every client and open a connection to each upstream service."""
+    get_index(index_name).describe_index_stats()
+    get_embeddings().embed_query("warm up")
+    print("[🔥] Clients warmed up")
+
+
+def reset_clients():
+    """Drop all cached clients so the next call rebuilds them from scratch."""
+    with _lock:
+        http_client = _clients.get("http")
+        _clients.clear()
+    if http_client is not None:
+        http_client.close()
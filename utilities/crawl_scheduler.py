@@ -0,0 +1,108 @@
+import asyncio
+import contextlib
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+USER_AGENT = "LocalGovGPT-Crawler"
+GLOBAL_CONCURRENCY = 32  # requests in flight across every site
+PER_HOST_CONCURRENCY = 2
+DEFAULT_DELAY = 2.0  # seconds between request starts on one host
+MAX_DELAY = 60.0
+RESPONSE_TIME_FACTOR = 2.0  # slow servers get proportionally more breathing room
+BACKOFF_STATUSES = (429, 503)
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class _HostState:
+    def __init__(self, delay):
+        self.min_delay = delay
+        self.delay = delay
+        self.next_start = 0.0
+        self.in_flight = asyncio.Semaphore(PER_HOST_CONCURRENCY)
+        self.robots = None
+
+
+class CrawlScheduler:
+    """Politeness scheduler shared by every site in a crawl.
+
+    Each host has a token bucket that releases one request start every
+    `delay` seconds, so waiting overlaps with other hosts' work instead of
+    sleeping after each page. The delay starts at the larger of `min_delay`
+    and the host's robots.txt Crawl-delay, follows the server's response
+    time (to headers, not the whole body), and backs off on 429/503 (honouring Retry-After). A global
+    semaphore caps requests in flight across all hosts.
+    """
+
+    def __init__(self, concurrency=GLOBAL_CONCURRENCY, min_delay=DEFAULT_DELAY, user_agent=USER_AGENT):
+        self.min_delay = min_delay
+        self.user_agent = user_agent
+        self._global = asyncio.Semaphore(concurrency)
+        self._hosts = {}
+
+    def _host(self, url):
+        netloc = urlparse(url).netloc
+        host = self._hosts.get(netloc)
+        if host is None:
+            host = self._hosts[netloc] = _HostState(self.min_delay)
+        return host
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url):
+        host = self._host(url)
+        loop = asyncio.get_running_loop()
+        async with host.in_flight:
+            # Reserve the next start time before waiting, so concurrent
+            # callers for one host queue up behind each other.
+            now = loop.time()
+            start = max(now, host.next_start)
+            host.next_start = start + host.delay
+            if start > now:
+                await asyncio.sleep(start - now)
+            async with self._global:
+                yield
+
+    def record(self, url, status, elapsed, retry_after=None):
+        host = self._host(url)
+        if status in BACKOFF_STATUSES:
+            wait = parse_retry_after(retry_after)
+            host.delay = min(MAX_DELAY, max(host.delay * 2, wait or 0.0))
+            resume = asyncio.get_running_loop().time() + (wait if wait is not None else host.delay)
+            host.next_start = max(host.next_start, resume)
+        elif status is not None:
+            target = max(host.min_delay, elapsed * RESPONSE_TIME_FACTOR)
+            host.delay = min(MAX_DELAY, 0.7 * host.delay + 0.3 * target)
+
+    def set_robots(self, url, robots_txt):
+        host = self._host(url)
+        robots = RobotFileParser()
+        robots.parse(robots_txt.splitlines())
+        host.robots = robots
+        crawl_delay = robots.crawl_delay(self.user_agent)
+        if crawl_delay:
+            host.min_delay = max(host.min_delay, float(crawl_delay))
+            host.delay = max(host.delay, host.min_delay)
+
+    def sitemaps_for(self, url):
+        robots = self._host(url).robots
+        return (robots.site_maps() or []) if robots else []
+
+    def can_fetch(self, url):
+        robots = self._host(url).robots
+        return robots is None or robots.can_fetch(self.user_agent, url)
+
+    def delay_for(self, url):
+        return self._host(url).delay
@@ -0,0 +1,119 @@
+import asyncio
+import random
+
+import aiohttp
+
+from utilities.crawl_scheduler import GLOBAL_CONCURRENCY, PER_HOST_CONCURRENCY
+
+try:  # aiohttp only decodes brotli when one of these is installed
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+HEADERS = {
+    "User-Agent": "LocalGovGPT-Crawler/1.0 (contact)",
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+KEEPALIVE_TIMEOUT = 30  # seconds an idle connection is kept for reuse
+DNS_CACHE_TTL = 600
+TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10, sock_read=20)
+PDF_TIMEOUT = aiohttp.ClientTimeout(total=180, connect=10, sock_read=30)  # up to MAX_PDF_BYTES
+# A page isn't known to be a PDF until its headers arrive, so page requests
+# only get the connect and per-read limits (a host stalling before its
+# headers is dropped after sock_read); the reader then holds the body to
+# TIMEOUT's or PDF_TIMEOUT's total
+PAGE_TIMEOUT = aiohttp.ClientTimeout(total=None, connect=TIMEOUT.connect, sock_read=TIMEOUT.sock_read)
+SITEMAP_TIMEOUT = aiohttp.ClientTimeout(total=120, connect=10, sock_read=30)  # sitemaps can run to tens of MB
+MAX_RETRIES = 2
+RETRY_BACKOFF = 1.0  # seconds, doubled per attempt plus jitter
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class ConnectionStats:
+    """Counts what the shared connector did, via aiohttp request tracing."""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+        self.retries = 0
+        self.bytes_received = 0
+
+    def trace_config(self):
+        config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.requests += 1
+            if (ctx.trace_request_ctx or {}).get("attempt"):
+                self.retries += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.new_connections += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.reused_connections += 1
+
+        async def on_dns_cache_hit(session, ctx, params):
+            self.dns_hits += 1
+
+        async def on_dns_cache_miss(session, ctx, params):
+            self.dns_misses += 1
+
+        async def on_response_chunk_received(session, ctx, params):
+            self.bytes_received += len(params.chunk)
+
+        config.on_request_start.append(on_request_start)
+        config.on_connection_create_end.append(on_connection_create_end)
+        config.on_connection_reuseconn.append(on_connection_reuseconn)
+        config.on_dns_cache_hit.append(on_dns_cache_hit)
+        config.on_dns_cache_miss.append(on_dns_cache_miss)
+        config.on_response_chunk_received.append(on_response_chunk_received)
+        return config
+
+    def summary(self):
+        connections = self.new_connections + self.reused_connections
+        reuse = self.reused_connections / connections if connections else 0.0
+        return (
+            f"{self.requests} requests over {self.new_connections} new connections "
+            f"({reuse:.0%} reused), {self.retries} retries, "
+            f"DNS cache {self.dns_hits} hits / {self.dns_misses} misses, "
+            f"{self.bytes_received / 1e6:.1f} MB decoded"
+        )
+
+
+def make_crawl_session(stats=None, limit=GLOBAL_CONCURRENCY, limit_per_host=PER_HOST_CONCURRENCY):
+    # One session per crawl: every fetch path shares this connector, so each
+    # host is handshaked once and its connections are kept alive between pages.
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        use_dns_cache=True,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=HEADERS,
+        timeout=TIMEOUT,
+        auto_decompress=True,
+        trace_configs=[stats.trace_config()] if stats else None,
+    )
+
+
+def retry_delay(attempt):
+    return RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random())
+
+
+def should_retry(attempt, status=None, error=None):
+    if attempt >= MAX_RETRIES:
+        return False
+    if error is not None:
+        return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
+    return status in RETRY_STATUSES
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+CRAWL_STATE_PATH = os.getenv("CRAWL_STATE_PATH", "data/crawl_state.sqlite")
+COMMIT_EVERY = 200  # pages recorded between commits
+
+
+def content_hash(text):
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+class CrawlState:
+    """What the last crawl saw for each URL, so a recrawl can skip the rest.
+
+    One row per URL with the HTTP validators (ETag, Last-Modified), the
+    sitemap <lastmod>, a hash of the extracted text, the links found on the
+    page and when it was last fetched. It is only touched from the crawl's
+    event loop, so a single connection is enough. With `full=True` earlier
+    rows are ignored (everything is refetched) but still overwritten.
+
+    A page recorded with confirmed=False (its text is still on its way into
+    the index) is not trusted as unchanged until confirm() is called for it,
+    so a run that dies before indexing refetches it next time.
+    """
+
+    def __init__(self, path=CRAWL_STATE_PATH, full=False):
+        self.path = path
+        self.full = full
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " council_id TEXT,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " sitemap_lastmod TEXT,"
+            " content_hash TEXT,"
+            " links TEXT,"
+            " fetched_at REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pages)")}
+        if "confirmed" not in columns:
+            self._conn.execute("ALTER TABLE pages ADD COLUMN confirmed INTEGER NOT NULL DEFAULT 1")
+        self._pending = 0
+
+    def get(self, url):
+        if self.full:
+            return None
+        row = self._conn.execute(
+            "SELECT etag, last_modified, sitemap_lastmod, content_hash, links, fetched_at, confirmed"
+            " FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        # Without a confirmed hash there are no conditional requests and no
+        # sitemap or content-hash skips, so the page goes through again
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "sitemap_lastmod": row[2],
+            "content_hash": row[3] if row[6] else None,
+            "links": json.loads(row[4]) if row[4] else [],
+            "fetched_at": row[5],
+        }
+
+    def conditional_headers(self, previous):
+        headers = {}
+        if previous and previous["content_hash"]:
+            if previous["etag"]:
+                headers["If-None-Match"] = previous["etag"]
+            if previous["last_modified"]:
+                headers["If-Modified-Since"] = previous["last_modified"]
+        return headers
+
+    def unchanged_in_sitemap(self, previous, sitemap_lastmod):
+        # Only trusted when the sitemap actually publishes lastmod and we have
+        # content from an earlier crawl to fall back on.
+        return bool(
+            previous and previous["content_hash"] and sitemap_lastmod
+            and previous["sitemap_lastmod"] == sitemap_lastmod
+        )
+
+    def record(self, url, council_id, etag=None, last_modified=None, sitemap_lastmod=None,
+               text_hash=None, links=None, confirmed=True):
+        self._conn.execute(
+            "INSERT INTO pages (url, council_id, etag, last_modified, sitemap_lastmod,"
+            " content_hash, links, fetched_at, confirmed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(url) DO UPDATE SET council_id = excluded.council_id,"
+            " etag = excluded.etag, last_modified = excluded.last_modified,"
+            " sitemap_lastmod = COALESCE(excluded.sitemap_lastmod, pages.sitemap_lastmod),"
+            " content_hash = excluded.content_hash, links = excluded.links,"
+            " fetched_at = excluded.fetched_at, confirmed = excluded.confirmed",
+            (url, council_id, etag, last_modified, sitemap_lastmod, text_hash,
+             json.dumps(sorted(links)) if links else None, time.time(), int(confirmed)),
+        )
+        self._changed()
+
+    def confirm(self, urls):
+        for url in urls:
+            self._conn.execute("UPDATE pages SET confirmed = 1 WHERE url = ?", (url,))
+            self._changed()
+
+    def touch(self, url, sitemap_lastmod=None):
+        self._conn.execute(
+            "UPDATE pages SET fetched_at = ?,"
+            " sitemap_lastmod = COALESCE(?, sitemap_lastmod) WHERE url = ?",
+            (time.time(), sitemap_lastmod, url),
+        )
+        self._changed()
+
+    def _changed(self):
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        self._conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.commit()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,125 @@
+import hashlib
+import re
+import zlib
+from urllib.parse import urlparse
+
+import numpy as np
+
+SHINGLE_WORDS = 5
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16  # 16 bands x 8 rows: pairs above ~0.7 Jaccard become candidates
+NEAR_DUPLICATE_THRESHOLD = 0.9  # estimated Jaccard needed to call two pages the same
+MINHASH_BLOCK = 4096  # shingles hashed at once; bounds memory at ~4 MB per call
+PRINT_VIEW = re.compile(r"print|/amp/?$|[?&](format|view)=", re.IGNORECASE)
+
+_rng = np.random.default_rng(20240601)  # fixed, so signatures are stable between runs
+_A = _rng.integers(1, 2**63, size=NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2**63, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_SHINGLE_MIX = _rng.integers(1, 2**63, size=SHINGLE_WORDS, dtype=np.uint64) | np.uint64(1)
+
+
+def normalise_text(text):
+    return " ".join(re.findall(r"\w+", text.casefold()))
+
+
+def text_fingerprint(text):
+    return hashlib.sha256(normalise_text(text).encode("utf-8")).hexdigest()
+
+
+def minhash(text):
+    words = normalise_text(text).split()
+    tokens = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+    if len(tokens) < SHINGLE_WORDS:
+        tokens = np.concatenate([tokens, np.zeros(SHINGLE_WORDS - len(tokens), dtype=np.uint64)])
+
+    # Word 5-gram hashes, combined with wrapping uint64 arithmetic
+    n = len(tokens) - SHINGLE_WORDS + 1
+    shingles = np.zeros(n, dtype=np.uint64)
+    for i in range(SHINGLE_WORDS):
+        shingles += tokens[i:i + n] * _SHINGLE_MIX[i]
+    shingles = np.unique(shingles)
+
+    # Multiply-shift hashing, one column per permutation, a block of shingles
+    # at a time so a long PDF never needs a shingles x permutations matrix
+    signature = np.full(NUM_PERMUTATIONS, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(shingles), MINHASH_BLOCK):
+        block = shingles[start:start + MINHASH_BLOCK, None]
+        np.minimum(signature, ((block * _A[None, :] + _B[None, :]) >> np.uint64(32)).min(axis=0), out=signature)
+    return signature
+
+
+def url_preference(url):
+    # Canonical copy: no query string, not a print view, then the shortest URL
+    parsed = urlparse(url)
+    return (bool(parsed.query), bool(PRINT_VIEW.search(url)), len(url), url)
+
+
+class Deduplicator:
+    """Exact and near-duplicate detection over a stream of pages.
+
+    Exact duplicates share a hash of their normalised text. Near duplicates
+    are found with MinHash signatures bucketed by LSH bands, then confirmed
+    on estimated Jaccard similarity. Pages are only compared within the same
+    scope (by default everything shares one scope).
+    """
+
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.rows = NUM_PERMUTATIONS // LSH_BANDS
+        self._exact = {}
+        self._buckets = {}
+        self._signatures = {}
+        self._keys = {}  # url -> (exact fingerprint, LSH keys), to forget an old copy
+
+    def _forget(self, url):
+        fingerprint, keys = self._keys.pop(url)
+        if self._exact.get(fingerprint) == url:
+            del self._exact[fingerprint]
+        for key in keys:
+            self._buckets[key].remove(url)
+        del self._signatures[url]
+
+    def add(self, url, text, scope=None):
+        # Returns (canonical url, "exact" | "near") for a duplicate, else None
+        # A URL never duplicates itself: re-adding a page replaces its old copy
+        if url in self._keys:
+            self._forget(url)
+        fingerprint = (scope, text_fingerprint(text))
+        if fingerprint in self._exact:
+            return self._exact[fingerprint], "exact"
+
+        signature = minhash(text)
+        keys = [(scope, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(LSH_BANDS)]
+        candidates = {other for key in keys for other in self._buckets.get(key, ())}
+        for other in sorted(candidates):
+            if np.mean(self._signatures[other] == signature) >= self.threshold:
+                return other, "near"
+
+        self._exact[fingerprint] = url
+        self._signatures[url] = signature
+        self._keys[url] = (fingerprint, keys)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(url)
+        return None
+
+
+def dedupe_pages(pages, scope=None, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Drops duplicate (url, text) pages, keeping one canonical copy of each.
+
+    Returns (unique pages, {canonical url: [alias urls]}, counts). `scope`
+    maps a URL to the group it is deduplicated within, e.g. its council.
+    """
+    dedup = Deduplicator(threshold)
+    unique = []
+    aliases = {}
+    counts = {"exact": 0, "near": 0}
+    for url, text in sorted(pages, key=lambda page: url_preference(page[0])):
+        duplicate = dedup.add(url, text, scope(url) if scope else None)
+        if duplicate is None:
+            unique.append((url, text))
+        else:
+            canonical, kind = duplicate
+            aliases.setdefault(canonical, []).append(url)
+            counts[kind] += 1
+    return unique, aliases, counts
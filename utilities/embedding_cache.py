@@ -0,0 +1,149 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_MEMORY_ENTRIES = 2048
+MAX_DISK_ENTRIES = 200_000
+EVICT_FRACTION = 0.1  # share of the disk tier dropped when it overflows
+
+
+def normalise_question(text):
+    # "Rubbish collection day?" and "  rubbish   collection day " share a key
+    text = re.sub(r"\s+", " ", text.casefold()).strip()
+    return text.rstrip("?!. ")
+
+
+class QueryEmbeddingCache:
+    """In-process LRU in front of a SQLite store of query embeddings.
+
+    Entries are keyed by (embedding model, normalised question text) and the
+    vectors are stored as raw float32 blobs. Both tiers evict least recently
+    used entries once they grow past their size limits.
+    """
+
+    def __init__(self, path, model, max_memory_entries=MAX_MEMORY_ENTRIES,
+                 max_disk_entries=MAX_DISK_ENTRIES):
+        self.path = path
+        self.model = model
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._disk_count = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                " model TEXT NOT NULL,"
+                " question TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " PRIMARY KEY (model, question))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS query_embeddings_last_used"
+                " ON query_embeddings (last_used)"
+            )
+            self._disk_count = conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, question):
+        key = normalise_question(question)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT vector FROM query_embeddings WHERE model = ? AND question = ?",
+                (self.model, key),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            conn.execute(
+                "UPDATE query_embeddings SET last_used = ? WHERE model = ? AND question = ?",
+                (time.time(), self.model, key),
+            )
+            conn.commit()
+            vector = np.frombuffer(row[0], dtype=np.float32)
+            self._remember(key, vector)
+            self.disk_hits += 1
+            return vector
+
+    def put(self, question, vector):
+        key = normalise_question(question)
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            conn = self._connect()
+            # Only a new row adds to the count; re-putting a question updates it in place
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO query_embeddings (model, question, vector, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                (self.model, key, vector.tobytes(), time.time()),
+            )
+            if cursor.rowcount:
+                self._disk_count += 1
+            else:
+                conn.execute(
+                    "UPDATE query_embeddings SET vector = ?, last_used = ? WHERE model = ? AND question = ?",
+                    (vector.tobytes(), time.time(), self.model, key),
+                )
+            if self._disk_count > self.max_disk_entries:
+                self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        # Drop a batch at once so a full cache doesn't pay for a DELETE per put
+        excess = self._disk_count - self.max_disk_entries
+        n = max(excess, int(self.max_disk_entries * EVICT_FRACTION))
+        conn.execute(
+            "DELETE FROM query_embeddings WHERE rowid IN ("
+            " SELECT rowid FROM query_embeddings ORDER BY last_used LIMIT ?)",
+            (n,),
+        )
+        self._disk_count = conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+    def embed_query(self, question, embed_fn):
+        vector = self.get(question)
+        if vector is None:
+            vector = np.asarray(embed_fn(question), dtype=np.float32)
+            self.put(question, vector)
+        return vector.tolist()
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": self._disk_count,
+        }
@@ -0,0 +1,264 @@
+import asyncio
+import inspect
+import os
+import random
+import time
+
+import numpy as np
+import openai
+
+from utilities.chunk_embedding_cache import text_hash
+from utilities.clients import EMBEDDING_MODEL, get_async_openai_client
+
+# Account limits; set these to your OpenAI tier so the scheduler stays under them
+EMBEDDING_TPM = int(os.getenv("EMBEDDING_TPM", "1000000"))
+EMBEDDING_RPM = int(os.getenv("EMBEDDING_RPM", "3000"))
+MAX_BATCH_TOKENS = 100_000  # per request; the API caps a request at 300k tokens
+MAX_BATCH_INPUTS = 2048  # per request, an API limit
+MAX_INPUT_TOKENS = 8191  # longer inputs are rejected by the API
+EMBED_CONCURRENCY = 4
+UPSERT_CONCURRENCY = 4
+UPSERT_BATCH_SIZE = 100
+MAX_RETRIES = 8
+BACKOFF_BASE = 1.0  # seconds, doubled per attempt with jitter
+BACKOFF_MAX = 60.0
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model(EMBEDDING_MODEL)
+        except Exception as e:  # the encoding file is downloaded on first use
+            print(f"[!] tiktoken unavailable ({e.__class__.__name__}); estimating tokens from length")
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding is False:
+        return len(text) // 3 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def fit_input(text, max_tokens=MAX_INPUT_TOKENS):
+    """(text, token count), cutting text to max_tokens; the API rejects longer inputs."""
+    encoding = _get_encoding()
+    if encoding is False:
+        # Without the tokenizer, cut at two characters a token to stay well under
+        tokens = count_tokens(text)
+        if tokens <= max_tokens and len(text) <= max_tokens * 2:
+            return text, tokens
+        text = text[:max_tokens * 2]
+        return text, min(count_tokens(text), max_tokens)
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text, len(tokens)
+    return encoding.decode(tokens[:max_tokens]), max_tokens
+
+
+def batch_by_tokens(token_counts, max_tokens=MAX_BATCH_TOKENS, max_inputs=MAX_BATCH_INPUTS):
+    """Split positions into consecutive batches under both request limits."""
+    batches, batch, batch_tokens = [], [], 0
+    for position, tokens in enumerate(token_counts):
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_inputs):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(position)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class RateBudget:
+    """Token buckets for requests and tokens per minute, shared by all callers."""
+
+    def __init__(self, tpm=EMBEDDING_TPM, rpm=EMBEDDING_RPM):
+        self.tpm = tpm
+        self.rpm = rpm
+        self._tokens = float(tpm)
+        self._requests = float(rpm)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+
+    async def acquire(self, tokens):
+        tokens = min(tokens, self.tpm)
+        async with self._lock:  # first come, first served
+            while True:
+                self._refill()
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0:
+                    if self._tokens >= tokens and self._requests >= 1:
+                        self._tokens -= tokens
+                        self._requests -= 1
+                        return
+                    wait = max((tokens - self._tokens) * 60 / self.tpm, (1 - self._requests) * 60 / self.rpm)
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        # A 429 means the server's view of our budget is tighter than ours
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def retry_after(error):
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def is_retryable(error):
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    # Vector store clients raise their own types; retry anything that
+    # looks like a throttle or a server-side failure.
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+def backoff(attempt, error=None):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * (0.5 + random.random())
+    hinted = retry_after(error) if error is not None else None
+    return max(delay, hinted or 0.0)
+
+
+class EmbeddingScheduler:
+    """Concurrent, rate-limited embedding and upsert requests with retries.
+
+    Inputs are packed into requests by token count, several requests run at
+    once under a shared TPM/RPM budget, and 429/5xx responses are retried
+    with exponential backoff (honouring Retry-After). Each completed batch
+    is handed to a callback straight away, which is where callers
+    checkpoint it, so a crash only loses the requests in flight.
+    """
+
+    def __init__(self, tpm=EMBEDDING_TPM, rpm=EMBEDDING_RPM, embed_concurrency=EMBED_CONCURRENCY,
+                 upsert_concurrency=UPSERT_CONCURRENCY, max_batch_tokens=MAX_BATCH_TOKENS,
+                 model=EMBEDDING_MODEL):
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.budget = RateBudget(tpm, rpm)
+        self._embed_slots = asyncio.Semaphore(embed_concurrency)
+        self._upsert_slots = asyncio.Semaphore(upsert_concurrency)
+        self.requests = 0
+        self.retries = 0
+        self.tokens = 0
+
+    async def _with_retries(self, call):
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except Exception as e:
+                if attempt >= MAX_RETRIES or not is_retryable(e):
+                    raise
+                delay = backoff(attempt, e)
+                if isinstance(e, openai.RateLimitError) or getattr(e, "status", None) == 429:
+                    self.budget.pause(delay)
+                self.retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _embed_batch(self, texts, tokens):
+        client = get_async_openai_client().with_options(max_retries=0)
+
+        async def call():
+            await self.budget.acquire(tokens)
+            self.requests += 1
+            response = await client.embeddings.create(model=self.model, input=texts)
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+        async with self._embed_slots:
+            vectors = await self._with_retries(call)
+        self.tokens += tokens
+        return vectors
+
+    async def embed(self, texts, on_batch=None):
+        """Embed texts; on_batch(positions, vectors) runs as each batch lands.
+
+        Texts over MAX_INPUT_TOKENS are truncated to it. on_batch may be a
+        coroutine function, to keep its I/O off the event loop.
+        """
+        fitted = [fit_input(text) for text in texts]
+        truncated = sum(fitted_text is not text for (fitted_text, _), text in zip(fitted, texts))
+        if truncated:
+            print(f"[✂️] Truncated {truncated} inputs to {MAX_INPUT_TOKENS} tokens")
+        texts = [text for text, _ in fitted]
+        token_counts = [tokens for _, tokens in fitted]
+        vectors = [None] * len(texts)
+
+        async def run(positions):
+            batch = await self._embed_batch([texts[i] for i in positions], sum(token_counts[i] for i in positions))
+            for position, vector in zip(positions, batch):
+                vectors[position] = vector
+            if on_batch is not None:
+                result = on_batch(positions, batch)
+                if inspect.isawaitable(result):
+                    await result
+
+        await asyncio.gather(*(run(positions) for positions in batch_by_tokens(token_counts, self.max_batch_tokens)))
+        return vectors
+
+    async def upsert(self, index, vectors, on_batch=None, batch_size=UPSERT_BATCH_SIZE):
+        """Upsert (id, values, metadata) tuples; on_batch(batch) after each."""
+
+        async def run(batch):
+            async with self._upsert_slots:
+                await self._with_retries(lambda: asyncio.to_thread(index.upsert, vectors=batch))
+            if on_batch is not None:
+                on_batch(batch)
+
+        await asyncio.gather(*(run(vectors[i:i + batch_size]) for i in range(0, len(vectors), batch_size)))
+
+    async def delete(self, index, ids, batch_size=1000):
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i:i + batch_size]
+            await self._with_retries(lambda: asyncio.to_thread(index.delete, ids=batch))
+
+    def summary(self):
+        return f"{self.requests} embedding requests, {self.tokens} tokens, {self.retries} retries"
+
+
+async def embed_with_cache(texts, cache, scheduler):
+    """Vectors for texts: cached ones from disk, the rest via the scheduler.
+
+    Every embedded batch is appended to the cache as soon as it lands, so
+    the cache doubles as the checkpoint for an interrupted run.
+    """
+    hashes = [text_hash(text) for text in texts]
+    found, missing = await asyncio.to_thread(cache.lookup, hashes)
+
+    # Identical chunks are embedded once
+    todo = {}
+    for position in missing:
+        todo.setdefault(hashes[position], texts[position])
+    todo_hashes = list(todo)
+
+    async def checkpoint(positions, vectors):
+        await asyncio.to_thread(cache.put_many, [todo_hashes[i] for i in positions], vectors)
+
+    fresh = await scheduler.embed(list(todo.values()), on_batch=checkpoint)
+    fresh = dict(zip(todo_hashes, fresh))
+    for position in missing:
+        found[position] = fresh[hashes[position]]
+
+    print(f"[🗃️] Embedding cache: {len(texts) - len(missing)} hits, {len(todo)} embedded")
+    return [list(map(float, np.asarray(found[position]))) for position in range(len(texts))]
@@ -0,0 +1,120 @@
+# CPU-bound page processing for the crawler. Everything here is a plain
+# function of its arguments, so it can run in a ProcessPoolExecutor and keep
+# the crawl event loop free for network I/O.
+
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse, urljoin
+
+import fitz  # PyMuPDF
+import trafilatura
+from lxml import etree
+from trafilatura.utils import load_html
+
+EXTRACT_WORKERS = os.cpu_count() or 4
+PDF_PAGE_MARKER = "[Page {}]"  # starts each PDF page's text; the chunker reads it back
+
+HREFS = etree.XPath("//a/@href")
+
+
+def make_extraction_pool(workers=EXTRACT_WORKERS):
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+async def run_cpu(pool, fn, *args):
+    # pool=None runs inline on the event loop, as the crawler used to
+    if pool is None:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+
+def get_domain_root(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def is_same_domain(url, root_domain):
+    return url.startswith(root_domain)
+
+
+def parse_html(html):
+    # trafilatura's own loader, so handing it the tree later gives the same
+    # text as handing it the string; None if it isn't HTML
+    return load_html(html)
+
+
+def extract_links(tree, base_url):
+    root = get_domain_root(base_url)
+    links = set()
+
+    for href in HREFS(tree):
+        if href.startswith(("mailto:", "tel:")):
+            continue
+        full_url = urljoin(base_url, href)
+        if is_same_domain(full_url, root):
+            links.add(full_url.split("#")[0])  # strip fragments
+
+    return links
+
+
+def extract_page(url, html, collect_links):
+    # One parse per page: links are read off the tree first, since
+    # trafilatura prunes the tree it is given
+    tree = parse_html(html)
+    if tree is None:
+        return None, set()
+    links = extract_links(tree, url) if collect_links else set()
+    return trafilatura.extract(tree), links
+
+
+def seed_urls_from_html(home_url, html, max_seeds):
+    tree = parse_html(html)
+    if tree is None:
+        return []
+    root = get_domain_root(home_url)
+    found = set()
+
+    for href in HREFS(tree):
+        if href.startswith(("mailto:", "tel:")):
+            continue
+
+        full_url = urljoin(home_url, href)
+        if not is_same_domain(full_url, root):
+            continue
+
+        path = urlparse(full_url).path
+        if path in ["/", ""] or "?" in path or "#" in path:
+            continue
+
+        # Shallow internal URLs only
+        if path.count("/") <= 3:
+            found.add(full_url.split("#")[0])
+
+    return sorted(found)[:max_seeds]
+
+
+def _open_pdf(source):
+    # source is the PDF's bytes or the path of a temp file holding them
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def pdf_page_count(source):
+    with _open_pdf(source) as doc:
+        return doc.page_count
+
+
+def pdf_pages_text(source, start=0, stop=None):
+    """[(page number, text)] for pages start..stop-1, numbered from 1."""
+    with _open_pdf(source) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        return [(number + 1, doc[number].get_text()) for number in range(start, stop)]
+
+
+def format_pdf_pages(pages):
+    text = "\n\n".join(
+        f"{PDF_PAGE_MARKER.format(number)}\n{page_text.strip()}" for number, page_text in pages if page_text.strip()
+    )
+    return text or None
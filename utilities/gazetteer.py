@@ -0,0 +1,48 @@
+import os
+import re
+import json
+import unicodedata
+from functools import lru_cache
+from urllib.parse import urlparse
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "council_gazetteer.json")
+
+
+def get_council_id(url):
+    domain = urlparse(url).netloc
+    return domain.replace(".", "_")
+
+
+def _normalise(text):
+    # "Whangārei", "Hawke’s Bay" and "hawke's bay" all match the same entry
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return text.lower().replace("’", "'")
+
+
+@lru_cache(maxsize=1)
+def _load_gazetteer(path=GAZETTEER_PATH):
+    with open(path, "r") as f:
+        councils = json.load(f)
+
+    place_councils = {}
+    for council in councils:
+        council_ids = [get_council_id(f"https://{domain}") for domain in council["domains"]]
+        for place in council["places"]:
+            place_councils.setdefault(_normalise(place), []).extend(council_ids)
+
+    # Longest names first, so "upper hutt" wins over "hutt" at the same spot
+    names = sorted(place_councils, key=len, reverse=True)
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(name) for name in names) + r")\b")
+    return pattern, place_councils
+
+
+def detect_councils(text):
+    """Return the council IDs for every place or council named in `text`."""
+    pattern, place_councils = _load_gazetteer()
+    council_ids = []
+    for match in pattern.finditer(_normalise(text)):
+        for council_id in place_councils[match.group(0)]:
+            if council_id not in council_ids:
+                council_ids.append(council_id)
+    return council_ids
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import sqlite3
+
+
+def chunk_id(source, ordinal, text):
+    # Same page, same position, same text -> same ID on every run
+    source_hash = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    return f"{source_hash}-{ordinal:04d}-{text_hash}"
+
+
+def assign_chunk_ids(docs):
+    """Content-derived IDs for split documents, numbered per source in order."""
+    ordinals = {}
+    ids = []
+    for doc in docs:
+        source = doc.metadata.get("source", "unknown")
+        ordinal = ordinals.get(source, 0)
+        ordinals[source] = ordinal + 1
+        ids.append(chunk_id(source, ordinal, doc.page_content))
+    return ids
+
+
+class IndexManifest:
+    """The chunk IDs already in the vector index, and the page each came from.
+
+    diff() compares a freshly split corpus against it: chunks whose ID is
+    new need embedding and upserting, IDs that are no longer produced need
+    deleting. Call apply() once the index has been updated.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " chunk_id TEXT PRIMARY KEY,"
+            " source TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)")
+
+    def diff(self, ids, sources, full=False):
+        """Return (positions of new chunks, stale chunk IDs).
+
+        With full=True, `ids` is the whole corpus and anything else in the
+        index is stale. Otherwise only the sources present in `sources` were
+        re-split, and stale IDs are limited to those pages.
+        """
+        if full:
+            existing = {row[0] for row in self._conn.execute("SELECT chunk_id FROM chunks")}
+        else:
+            existing = set()
+            for source in set(sources):
+                existing.update(row[0] for row in self._conn.execute(
+                    "SELECT chunk_id FROM chunks WHERE source = ?", (source,)
+                ))
+        current = set(ids)
+        new_positions = []
+        seen = set()
+        for position, chunk in enumerate(ids):
+            if chunk not in existing and chunk not in seen:
+                seen.add(chunk)
+                new_positions.append(position)
+        return new_positions, sorted(existing - current)
+
+    def sources(self):
+        return [row[0] for row in self._conn.execute("SELECT DISTINCT source FROM chunks")]
+
+    def ids_outside(self, sources):
+        """Chunk IDs of pages not in `sources`, i.e. pages gone from the corpus."""
+        sources = set(sources)
+        return sorted(
+            chunk for chunk, source in self._conn.execute("SELECT chunk_id, source FROM chunks")
+            if source not in sources
+        )
+
+    def apply(self, added, removed):
+        """Record (chunk_id, source) pairs as uploaded and removed IDs as gone."""
+        with self._conn:
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", ((chunk,) for chunk in removed))
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (chunk_id, source) VALUES (?, ?)", added)
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
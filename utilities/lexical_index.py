@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import shutil
+import threading
+from collections import Counter
+
+import numpy as np
+
+MANIFEST_FILE = "manifest.json"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Keeps bylaw numbers ("2019/12"), form codes ("bc-12") and dotted codes whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-/.][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in is it my of on or "
+    "the to what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class _Segment:
+    # One immutable batch of documents. Postings for terms[i] are
+    # docs[offsets[i]:offsets[i + 1]] with matching term frequencies in tfs.
+    def __init__(self, path):
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, "terms.json"), "r") as f:
+            self.term_index = {term: i for i, term in enumerate(json.load(f))}
+        with open(os.path.join(path, "doc_ids.json"), "r") as f:
+            self.doc_ids = json.load(f)
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.docs = np.load(os.path.join(path, "docs.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+        self.doc_lens = np.load(os.path.join(path, "doc_lens.npy"))
+        self.alive = np.ones(len(self.doc_ids), dtype=bool)
+        # Optional per-document group label (the council ID) for filtering
+        with open(os.path.join(path, "groups.json"), "r") as f:
+            self.groups = json.load(f)
+        self.group_lookup = {}
+        self.group_codes = np.asarray(
+            [self.group_lookup.setdefault(group, len(self.group_lookup)) for group in self.groups],
+            dtype=np.int32,
+        )
+
+    def allowed(self, groups):
+        if groups is None:
+            return self.alive
+        wanted = [self.group_lookup[group] for group in groups if group in self.group_lookup]
+        return self.alive & np.isin(self.group_codes, wanted)
+
+    def postings(self, term):
+        i = self.term_index.get(term)
+        if i is None:
+            return None, None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.docs[start:end], self.tfs[start:end]
+
+
+def _write_segment(path, doc_ids, term_postings, doc_lens, groups):
+    terms = sorted(term_postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(term_postings[term]) for term in terms])
+    docs = np.empty(offsets[-1], dtype=np.uint32)
+    tfs = np.empty(offsets[-1], dtype=np.uint16)
+    for i, term in enumerate(terms):
+        postings = np.asarray(term_postings[term], dtype=np.int64).reshape(-1, 2)
+        docs[offsets[i]:offsets[i + 1]] = postings[:, 0]
+        tfs[offsets[i]:offsets[i + 1]] = np.minimum(postings[:, 1], np.iinfo(np.uint16).max)
+
+    os.makedirs(path)
+    np.save(os.path.join(path, "offsets.npy"), offsets)
+    np.save(os.path.join(path, "docs.npy"), docs)
+    np.save(os.path.join(path, "tfs.npy"), tfs)
+    np.save(os.path.join(path, "doc_lens.npy"), np.asarray(doc_lens, dtype=np.uint32))
+    with open(os.path.join(path, "terms.json"), "w") as f:
+        json.dump(terms, f)
+    with open(os.path.join(path, "doc_ids.json"), "w") as f:
+        json.dump(list(doc_ids), f)
+    with open(os.path.join(path, "groups.json"), "w") as f:
+        json.dump(list(groups), f)
+
+
+class LexicalIndex:
+    """BM25 over an inverted index built from immutable on-disk segments.
+
+    Every add_documents() call writes one new segment (postings as flat
+    numpy arrays, memory-mapped on load) and lists it in manifest.json, so
+    the index grows incrementally. Re-adding a document ID supersedes its
+    older copy; compact() merges all live documents into a single segment.
+    """
+
+    def __init__(self, path, k1=BM25_K1, b=BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._segments = []
+        self._manifest_mtime = None
+
+    def _manifest(self):
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return {"segments": [], "next_segment": 0, "deleted": {}}
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest):
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def _refresh(self):
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return
+        mtime = os.stat(manifest_path).st_mtime_ns
+        if mtime == self._manifest_mtime:
+            return
+        self._manifest_mtime = mtime
+        manifest = self._manifest()
+
+        loaded = {segment.name: segment for segment in self._segments}
+        segments = [loaded.get(name) or _Segment(os.path.join(self.path, name))
+                    for name in manifest["segments"]]
+
+        # Newer segments win; a delete hides copies in segments that existed
+        # when it was issued.
+        latest = {}
+        for position, segment in enumerate(segments):
+            segment.alive[:] = True
+            for local, doc_id in enumerate(segment.doc_ids):
+                previous = latest.get(doc_id)
+                if previous is not None:
+                    segments[previous[0]].alive[previous[1]] = False
+                latest[doc_id] = (position, local)
+        for doc_id, segment_count in manifest["deleted"].items():
+            location = latest.get(doc_id)
+            if location is not None and location[0] < segment_count:
+                segments[location[0]].alive[location[1]] = False
+        self._segments = segments
+
+    def add_documents(self, doc_ids, texts, groups=None):
+        doc_ids = list(doc_ids)
+        groups = list(groups) if groups is not None else [None] * len(doc_ids)
+        term_postings = {}
+        doc_lens = []
+        for local, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_postings.setdefault(term, []).append((local, tf))
+        if not doc_lens:
+            return
+
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            manifest = self._manifest()
+            name = f"segment_{manifest['next_segment']:06d}"
+            _write_segment(os.path.join(self.path, name), doc_ids, term_postings, doc_lens, groups)
+            manifest["segments"].append(name)
+            manifest["next_segment"] += 1
+            self._save_manifest(manifest)
+            self._refresh()
+        print(f"[🔤] Indexed {len(doc_lens)} chunks for keyword search ({name})")
+
+    def delete(self, doc_ids):
+        with self._lock:
+            manifest = self._manifest()
+            for doc_id in doc_ids:
+                manifest["deleted"][doc_id] = len(manifest["segments"])
+            self._save_manifest(manifest)
+            self._refresh()
+
+    def search(self, query, top_k=10, groups=None):
+        """Return up to top_k (doc_id, bm25_score) pairs, best first.
+
+        With `groups`, only documents added under one of those groups are
+        searched, and the BM25 statistics are taken over that subset.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            self._refresh()
+            segments = self._segments
+            allowed = [segment.allowed(groups) for segment in segments]
+        if not terms or not segments:
+            return []
+
+        n_docs = sum(int(mask.sum()) for mask in allowed)
+        if not n_docs:
+            return []
+        avgdl = sum(int(segment.doc_lens[mask].sum()) for segment, mask in zip(segments, allowed)) / n_docs
+
+        scores = [None] * len(segments)
+        for term in terms:
+            hits = []
+            df = 0
+            for i, segment in enumerate(segments):
+                docs, tfs = segment.postings(term)
+                if docs is None:
+                    continue
+                keep = allowed[i][docs]
+                docs, tfs = docs[keep], tfs[keep].astype(np.float32)
+                df += len(docs)
+                hits.append((i, docs, tfs))
+            if not df:
+                continue
+
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for i, docs, tfs in hits:
+                if scores[i] is None:
+                    scores[i] = np.zeros(len(segments[i].doc_ids), dtype=np.float32)
+                norm = self.k1 * (1 - self.b + self.b * segments[i].doc_lens[docs] / avgdl)
+                scores[i][docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        results = []
+        for segment, segment_scores in zip(segments, scores):
+            if segment_scores is None:
+                continue
+            candidates = np.flatnonzero(segment_scores)
+            if len(candidates) > top_k:
+                candidates = candidates[np.argpartition(-segment_scores[candidates], top_k - 1)[:top_k]]
+            results.extend((segment.doc_ids[doc], float(segment_scores[doc])) for doc in candidates)
+        results.sort(key=lambda result: -result[1])
+        return results[:top_k]
+
+    def compact(self):
+        """Merge every live document into one segment and drop the rest."""
+        with self._lock:
+            self._refresh()
+            segments = self._segments
+            if len(segments) <= 1 and not self._manifest()["deleted"]:
+                return
+
+            doc_ids, doc_lens, groups, remaps = [], [], [], []
+            for segment in segments:
+                remap = np.full(len(segment.doc_ids), -1, dtype=np.int64)
+                for local in np.flatnonzero(segment.alive):
+                    remap[local] = len(doc_ids)
+                    doc_ids.append(segment.doc_ids[local])
+                    doc_lens.append(int(segment.doc_lens[local]))
+                    groups.append(segment.groups[local])
+                remaps.append(remap)
+
+            term_postings = {}
+            for segment, remap in zip(segments, remaps):
+                for term in segment.term_index:
+                    docs, tfs = segment.postings(term)
+                    new_docs = remap[docs]
+                    keep = new_docs >= 0
+                    if keep.any():
+                        term_postings.setdefault(term, []).extend(
+                            zip(new_docs[keep].tolist(), tfs[keep].tolist()))
+
+            manifest = self._manifest()
+            name = f"segment_{manifest['next_segment']:06d}"
+            _write_segment(os.path.join(self.path, name), doc_ids, term_postings, doc_lens, groups)
+            old_names = manifest["segments"]
+            self._save_manifest({"segments": [name], "next_segment": manifest["next_segment"] + 1, "deleted": {}})
+            self._refresh()
+            # Open readers keep their memory maps of the removed files
+            for old_name in old_names:
+                shutil.rmtree(os.path.join(self.path, old_name), ignore_errors=True)
+        print(f"[🔤] Compacted {len(old_names)} keyword segments into {name} ({len(doc_ids)} chunks)")
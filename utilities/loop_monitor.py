@@ -0,0 +1,47 @@
+import asyncio
+
+
+class LoopStallMonitor:
+    """Measures how long the event loop is blocked by synchronous work.
+
+    A background task sleeps for `interval` seconds at a time; any time it
+    oversleeps by is time the loop spent running something that didn't
+    yield, such as a blocking HTTP call or an in-loop HTML parse.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.total_stall = 0.0
+        self.max_stall = 0.0
+        self.elapsed = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            elapsed = loop.time() - start
+            stall = elapsed - self.interval
+            self.elapsed += elapsed
+            if stall > 0:
+                self.total_stall += stall
+                self.max_stall = max(self.max_stall, stall)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def summary(self):
+        share = self.total_stall / self.elapsed if self.elapsed else 0.0
+        return (f"event loop stalled {self.total_stall:.2f}s of {self.elapsed:.2f}s "
+                f"({share:.0%}), longest stall {self.max_stall * 1000:.0f} ms")
@@ -0,0 +1,227 @@
+import gzip
+import json
+import os
+import sqlite3
+from collections import namedtuple
+from datetime import datetime
+
+from utilities.crawl_state import content_hash
+
+PAGE_ARCHIVE_PATH = os.getenv("PAGE_ARCHIVE_PATH", "data/archive")
+INDEX_FILE = "index.sqlite"
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024  # start a new segment beyond this
+COMPRESSION_LEVEL = 6
+
+ArchivedPage = namedtuple("ArchivedPage", ["url", "text", "scraped_at", "content_hash"])
+
+
+def _segment_name(number):
+    return f"segment-{number:05d}.gz"
+
+
+class PageArchive:
+    """One council's extracted pages, appended to compressed segment files.
+
+    Like a WARC.gz, each record is its own gzip member (a JSON header line,
+    then the text), so `zcat segment-*.gz` reads the lot and any single
+    record can be decompressed on its own. index.sqlite maps each URL to
+    its latest record (segment, offset, length) and content hash. A
+    re-crawled page is appended again; the old record stays in its
+    segment as dead bytes until compact().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(path, INDEX_FILE))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " content_hash TEXT NOT NULL,"
+            " segment INTEGER NOT NULL,"
+            " offset INTEGER NOT NULL,"
+            " length INTEGER NOT NULL,"
+            " scraped_at TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_hash ON pages (content_hash)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_position ON pages (segment, offset)")
+        self._segment = None
+        self._segment_number = None
+
+    def _segment_path(self, number):
+        return os.path.join(self.path, _segment_name(number))
+
+    def _open_segment(self):
+        if self._segment is not None:
+            return
+        numbers = self._segment_numbers()
+        number = numbers[-1] if numbers else 0
+        # Bytes after the last indexed record were written by a crashed run
+        end = self._conn.execute(
+            "SELECT MAX(offset + length) FROM pages WHERE segment = ?", (number,)
+        ).fetchone()[0] or 0
+        self._segment = open(self._segment_path(number), "ab")
+        self._segment.truncate(end)
+        self._segment.seek(end)
+        self._segment_number = number
+
+    def _segment_numbers(self):
+        return sorted(
+            int(name[len("segment-"):-len(".gz")]) for name in os.listdir(self.path)
+            if name.startswith("segment-") and name.endswith(".gz")
+        )
+
+    def append(self, url, text, scraped_at=None):
+        """Archive a page. Returns False if its text is unchanged since last time."""
+        text = text.strip()
+        digest = content_hash(text)
+        row = self._conn.execute("SELECT content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is not None and row[0] == digest:
+            return False
+
+        scraped_at = scraped_at or datetime.utcnow().isoformat() + "Z"
+        header = json.dumps({"url": url, "scraped_at": scraped_at, "content_hash": digest})
+        record = gzip.compress(f"{header}\n{text}".encode("utf-8"), COMPRESSION_LEVEL)
+
+        self._open_segment()
+        if self._segment.tell() and self._segment.tell() + len(record) > SEGMENT_MAX_BYTES:
+            self._segment.close()
+            self._segment_number += 1
+            self._segment = open(self._segment_path(self._segment_number), "ab")
+        offset = self._segment.tell()
+        self._segment.write(record)
+        self._segment.flush()  # the record is on disk before the index points at it
+
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, content_hash, segment, offset, length, scraped_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, digest, self._segment_number, offset, len(record), scraped_at),
+            )
+        return True
+
+    def _read(self, f, offset, length):
+        f.seek(offset)
+        header, text = gzip.decompress(f.read(length)).decode("utf-8").split("\n", 1)
+        header = json.loads(header)
+        return ArchivedPage(header["url"], text, header["scraped_at"], header["content_hash"])
+
+    def get(self, url):
+        row = self._conn.execute("SELECT segment, offset, length FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        if self._segment is not None:
+            self._segment.flush()
+        with open(self._segment_path(row[0]), "rb") as f:
+            return self._read(f, row[1], row[2])
+
+    def urls_with_hash(self, digest):
+        return [row[0] for row in self._conn.execute("SELECT url FROM pages WHERE content_hash = ?", (digest,))]
+
+    def hashes(self):
+        """{url: content hash} for every archived page, straight from the index."""
+        return dict(self._conn.execute("SELECT url, content_hash FROM pages"))
+
+    def scan(self):
+        """Yield the latest record of every page, in on-disk order."""
+        if self._segment is not None:
+            self._segment.flush()
+        rows = self._conn.execute("SELECT segment, offset, length FROM pages ORDER BY segment, offset").fetchall()
+        f, current = None, None
+        try:
+            for segment, offset, length in rows:
+                if segment != current:
+                    if f is not None:
+                        f.close()
+                    f, current = open(self._segment_path(segment), "rb"), segment
+                yield self._read(f, offset, length)
+        finally:
+            if f is not None:
+                f.close()
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def compact(self):
+        """Rewrite the segments with only the latest record of each page.
+
+        Returns (bytes before, bytes after).
+        """
+        before = sum(os.path.getsize(self._segment_path(n)) for n in self._segment_numbers())
+        old_numbers = self._segment_numbers()
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+        # New segments are numbered after the old ones, so nothing is
+        # overwritten until the index points at the copies
+        number = (old_numbers[-1] + 1) if old_numbers else 0
+        moved = []
+        out = open(self._segment_path(number), "wb")
+        rows = self._conn.execute(
+            "SELECT url, segment, offset, length FROM pages ORDER BY segment, offset"
+        ).fetchall()
+        source, current = None, None
+        for url, segment, offset, length in rows:
+            if segment != current:
+                if source is not None:
+                    source.close()
+                source, current = open(self._segment_path(segment), "rb"), segment
+            source.seek(offset)
+            record = source.read(length)
+            if out.tell() and out.tell() + length > SEGMENT_MAX_BYTES:
+                out.close()
+                number += 1
+                out = open(self._segment_path(number), "wb")
+            moved.append((number, out.tell(), url))
+            out.write(record)
+        out.close()
+        if source is not None:
+            source.close()
+
+        with self._conn:
+            self._conn.executemany("UPDATE pages SET segment = ?, offset = ? WHERE url = ?", moved)
+        for old in old_numbers:
+            os.remove(self._segment_path(old))
+
+        after = sum(os.path.getsize(self._segment_path(n)) for n in self._segment_numbers())
+        return before, after
+
+    def close(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def archived_councils(root=PAGE_ARCHIVE_PATH):
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        entry.name for entry in os.scandir(root)
+        if entry.is_dir() and os.path.exists(os.path.join(entry.path, INDEX_FILE))
+    )
+
+
+_open_archives = {}
+
+
+def get_page_archive(council_id, root=PAGE_ARCHIVE_PATH):
+    # One writer per council for the life of the crawl
+    key = (root, council_id)
+    if key not in _open_archives:
+        _open_archives[key] = PageArchive(os.path.join(root, council_id))
+    return _open_archives[key]
+
+
+def close_page_archives():
+    while _open_archives:
+        _open_archives.popitem()[1].close()
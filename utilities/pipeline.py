@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+STOP = object()  # end-of-stream marker passed down the queues
+
+
+class Failed:
+    """Passed down the queues in place of STOP when a stage raises, so the
+    stages after it stop instead of waiting for input that won't come."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def pass_failure(queue, error):
+    # Never blocks: a full queue's consumer is still running and is
+    # cancelled along with the rest of the pipeline by run_stages
+    if queue is not None and not queue.full():
+        queue.put_nowait(error if isinstance(error, Failed) else Failed(error))
+
+
+async def run_stages(*stages):
+    """Run pipeline stages together, returning their results like gather.
+
+    The first stage to raise cancels all the others and its exception is
+    re-raised, so a dead consumer can't leave its producers blocked on a
+    full queue forever.
+    """
+    tasks = [asyncio.ensure_future(stage) for stage in stages]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in done:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+
+    def summary(self):
+        return f"{self.name}: {self.items} items, {self.busy:.1f}s busy"
+
+
+async def run_stage(name, fn, inbox, outbox=None, workers=1, stats=None):
+    """Run `workers` copies of `await fn(item)` over inbox until STOP.
+
+    Non-None results go to outbox; a full outbox blocks the workers, which
+    is what bounds memory across the pipeline. STOP is passed on once every
+    worker has finished. If `fn` raises, the other workers are cancelled,
+    Failed is passed on instead and the exception re-raised; a Failed from
+    upstream is passed on without raising.
+    """
+    stats = stats if stats is not None else StageStats(name)
+
+    async def work():
+        while True:
+            item = await inbox.get()
+            if item is STOP or isinstance(item, Failed):
+                await inbox.put(item)  # let sibling workers see it too
+                return item
+            start = time.monotonic()
+            result = await fn(item)
+            stats.busy += time.monotonic() - start
+            stats.items += 1
+            if result is not None and outbox is not None:
+                await outbox.put(result)
+
+    try:
+        ends = await run_stages(*(work() for _ in range(workers)))
+    except Exception as e:
+        pass_failure(outbox, e)
+        raise
+    failed = next((end for end in ends if isinstance(end, Failed)), None)
+    if failed is not None:
+        pass_failure(outbox, failed)
+    elif outbox is not None:
+        await outbox.put(STOP)
+    return stats
+
+
+async def run_batcher(inbox, outbox, max_size, max_wait=5.0):
+    """Group list items from inbox into lists of about max_size for outbox.
+
+    A partial batch is flushed after max_wait seconds without reaching the
+    size, so a slow crawl still gets indexed promptly.
+    """
+    batch = []
+    while True:
+        # Not wait_for: it can swallow a cancellation that lands as the get
+        # completes, leaving a cancelled pipeline stuck here
+        getter = asyncio.ensure_future(inbox.get())
+        try:
+            await asyncio.wait([getter], timeout=max_wait if batch else None)
+        finally:
+            getter.cancel()  # no-op once it has an item
+        item = getter.result() if getter.done() and not getter.cancelled() else None
+        if isinstance(item, Failed):
+            pass_failure(outbox, item)
+            return
+        if item is STOP or item is None:
+            if batch:
+                await outbox.put(batch)
+                batch = []
+            if item is STOP:
+                await outbox.put(STOP)
+                return
+            continue
+        batch.extend(item)
+        if len(batch) >= max_size:
+            await outbox.put(batch)
+            batch = []
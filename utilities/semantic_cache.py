@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+INDEX_GENERATION_PATH = "data/index_generation"
+MAX_DISTANCE = 0.02  # cosine distance between paraphrases that share an answer
+MIN_TERM_OVERLAP = 0.5  # Jaccard overlap of the two questions' key terms
+TTL_SECONDS = 24 * 60 * 60
+MAX_ENTRIES = 2000
+
+
+def mark_index_rebuilt(path=INDEX_GENERATION_PATH):
+    # Called by the ingestion scripts after they change the index; every
+    # SemanticAnswerCache watching this file drops its entries on next lookup.
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write(f"{time.time()}\n")
+
+
+def _index_generation(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class SemanticAnswerCache:
+    """Answers keyed by query vector, matched by cosine distance.
+
+    Query vectors are kept as normalised rows of one float32 matrix, so a
+    lookup is a single matrix-vector product. Entries expire after a TTL and
+    the least recently used entry is replaced once the cache is full.
+    A match must also share the caller's `key` (e.g. top_k and the councils
+    the question names), since near-identical wording can still need a
+    different answer. If `terms` (the question's key terms) are given, it
+    must overlap the cached question's by MIN_TERM_OVERLAP too: "register
+    my dog" and "register my cat" embed closer than many paraphrases do.
+    """
+
+    def __init__(self, dim, max_distance=MAX_DISTANCE, ttl=TTL_SECONDS,
+                 max_entries=MAX_ENTRIES, generation_path=INDEX_GENERATION_PATH,
+                 min_term_overlap=MIN_TERM_OVERLAP):
+        self.max_distance = max_distance
+        self.min_term_overlap = min_term_overlap
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation_path = generation_path
+        self.hits = 0
+        self.misses = 0
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._entries = [None] * max_entries
+        self._size = 0
+        self._generation = _index_generation(generation_path)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalise(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _terms_match(self, cached, terms):
+        if cached is None or terms is None:
+            return True
+        union = cached | terms
+        return not union or len(cached & terms) / len(union) >= self.min_term_overlap
+
+    def _check_generation(self):
+        generation = _index_generation(self.generation_path)
+        if generation != self._generation:
+            self._generation = generation
+            self._clear()
+
+    def _clear(self):
+        self._entries = [None] * self.max_entries
+        self._created[:] = 0
+        self._last_used[:] = 0
+        self._size = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+
+    def lookup(self, query_vector, key, terms=None):
+        query = self._normalise(query_vector)
+        now = time.time()
+        with self._lock:
+            self._check_generation()
+            if self._size:
+                similarities = self._vectors[:self._size] @ query
+                similarities[self._created[:self._size] < now - self.ttl] = -1.0
+                for slot in np.argsort(-similarities)[:4]:
+                    if 1.0 - similarities[slot] > self.max_distance:
+                        break
+                    entry = self._entries[slot]
+                    if entry["key"] == key and self._terms_match(entry["terms"], terms):
+                        self._last_used[slot] = now
+                        self.hits += 1
+                        return {"answer": entry["answer"], "sources": list(entry["sources"])}
+            self.misses += 1
+            return None
+
+    def store(self, query_vector, key, result, terms=None):
+        now = time.time()
+        with self._lock:
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                # Expired entries go first, then the least recently used one
+                expired = self._created < now - self.ttl
+                slot = int(np.argmax(expired)) if expired.any() else int(np.argmin(self._last_used))
+            self._vectors[slot] = self._normalise(query_vector)
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._entries[slot] = {
+                "key": key,
+                "terms": frozenset(terms) if terms is not None else None,
+                "answer": result["answer"],
+                "sources": list(result["sources"]),
+            }
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._size,
+        }
@@ -0,0 +1,89 @@
+import zlib
+from collections import namedtuple
+
+from lxml import etree
+
+# Where sitemaps usually live when robots.txt doesn't say
+SITEMAP_PATHS = ("/sitemap.xml", "/sitemap_index.xml", "/sitemap.xml.gz", "/wp-sitemap.xml")
+
+SitemapEntry = namedtuple("SitemapEntry", ["url", "lastmod", "priority"])
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1].lower() if isinstance(tag, str) else ""
+
+
+class SitemapParser:
+    """Incremental sitemap parser: feed it bytes as they arrive.
+
+    Handles both <urlset> and <sitemapindex> documents, gzip-compressed or
+    not (detected from the first bytes, since .xml.gz files are often
+    served without a Content-Encoding header). feed() returns what the new
+    bytes completed: SitemapEntry tuples for pages and plain URLs for child
+    sitemaps. Parsed elements are cleared, so memory stays flat however
+    large the sitemap is.
+    """
+
+    def __init__(self):
+        self._parser = etree.XMLPullParser(events=("end",), resolve_entities=False, no_network=True, huge_tree=True)
+        self._decompressor = None
+        self._started = False
+        self.kind = None  # "urlset" or "sitemapindex" once the root is seen
+
+    def feed(self, data):
+        if not self._started:
+            self._started = True
+            if data[:2] == b"\x1f\x8b":
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._decompressor is not None:
+            data = self._decompressor.decompress(data)
+        if data:
+            self._parser.feed(data)
+        return self._drain()
+
+    def close(self):
+        if self._decompressor is not None:
+            tail = self._decompressor.flush()
+            if tail:
+                self._parser.feed(tail)
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError:
+            pass  # a truncated sitemap still yields what parsed
+        return self._drain()
+
+    def _drain(self):
+        pages, sitemaps = [], []
+        for _, element in self._parser.read_events():
+            tag = _local(element.tag)
+            if tag in ("urlset", "sitemapindex"):
+                self.kind = tag
+            elif tag in ("url", "sitemap"):
+                fields = {_local(child.tag): (child.text or "").strip() for child in element}
+                loc = fields.get("loc")
+                if loc and tag == "url":
+                    pages.append(SitemapEntry(loc, fields.get("lastmod") or None, _priority(fields.get("priority"))))
+                elif loc:
+                    sitemaps.append(loc)
+                element.clear()
+                # Drop already-parsed siblings so the tree doesn't grow
+                parent = element.getparent()
+                if parent is not None:
+                    while element.getprevious() is not None:
+                        del parent[0]
+        return pages, sitemaps
+
+
+def _priority(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def crawl_order(entries):
+    # Highest <priority> first (0.5 is the protocol default), then the most
+    # recently modified, so a max_pages cut keeps the pages that matter.
+    # ISO 8601 dates sort lexically; entries without lastmod go last.
+    newest_first = sorted(entries, key=lambda entry: entry.lastmod or "", reverse=True)
+    return sorted(newest_first, key=lambda entry: -(entry.priority if entry.priority is not None else 0.5))
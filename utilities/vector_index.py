@@ -0,0 +1,334 @@
+import os
+import json
+import fcntl
+import contextlib
+import threading
+
+import numpy as np
+
+VECTORS_FILE = "vectors.f32"
+ROWS_FILE = "rows.jsonl"
+INFO_FILE = "index.json"
+LOCK_FILE = "write.lock"
+# int8 codes: a float32 per-dimension scale header followed by one int8 row
+# per vector, in the same order as vectors.f32
+CODES_FILE = "codes.i8"
+
+OVERSAMPLE = 4  # shortlist top_k * OVERSAMPLE rows by int8 score, then rescore
+BLOCK_ROWS = 256  # int8 rows widened to float32 at a time while scoring
+
+
+def normalise_rows(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_rows(scores, k):
+    # argpartition is O(n); only the k survivors get sorted
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def int8_scores(codes, scaled_query, block_rows=BLOCK_ROWS):
+    # numpy has no int8 matmul, so widen a cache-sized block at a time into
+    # a reused float32 buffer instead of converting the whole matrix.
+    scores = np.empty(len(codes), dtype=np.float32)
+    buffer = np.empty((block_rows, codes.shape[1]), dtype=np.float32)
+    for start in range(0, len(codes), block_rows):
+        block = codes[start:start + block_rows]
+        np.copyto(buffer[:len(block)], block, casting="unsafe")
+        np.matmul(buffer[:len(block)], scaled_query, out=scores[start:start + len(block)])
+    return scores
+
+
+def quantise_index(path, rebuild=False, block_rows=4096):
+    """Write int8 codes for the vectors in a LocalVectorIndex directory.
+
+    Each dimension gets a symmetric scale (max |value| / 127). By default only
+    rows added since the last run are encoded with the existing scales;
+    rebuild=True recomputes the scales and re-encodes everything into a new
+    file that replaces the old one atomically, so open readers are unaffected.
+    """
+    with open(os.path.join(path, INFO_FILE), "r") as f:
+        dim = json.load(f)["dim"]
+    vectors_path = os.path.join(path, VECTORS_FILE)
+    codes_path = os.path.join(path, CODES_FILE)
+    n = os.path.getsize(vectors_path) // (dim * 4)
+    vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(n, dim))
+
+    if rebuild or not os.path.exists(codes_path):
+        absmax = np.zeros(dim, dtype=np.float32)
+        for start in range(0, n, block_rows):
+            np.maximum(absmax, np.abs(vectors[start:start + block_rows]).max(axis=0), out=absmax)
+        scales = absmax / 127
+        scales[scales == 0] = 1.0
+        start, target, mode = 0, codes_path + ".tmp", "wb"
+    else:
+        scales = np.fromfile(codes_path, dtype=np.float32, count=dim)
+        start = (os.path.getsize(codes_path) - dim * 4) // dim
+        target, mode = codes_path, "ab"
+
+    with open(target, mode) as f:
+        if mode == "wb":
+            f.write(scales.astype(np.float32).tobytes())
+        for block_start in range(start, n, block_rows):
+            block = vectors[block_start:block_start + block_rows] / scales
+            f.write(np.clip(np.rint(block), -127, 127).astype(np.int8).tobytes())
+    if target != codes_path:
+        os.replace(target, codes_path)
+
+    print(f"[🗜️] Quantised {n - start} vectors to int8 ({n} total, {os.path.getsize(codes_path) / 1e6:.1f} MB)")
+
+
+class LocalVectorIndex:
+    """Exact cosine search over a memory-mapped float32 matrix.
+
+    Drop-in for the parts of a Pinecone index handle that the app uses:
+    upsert(vectors=...), delete(ids=...), query(vector=..., top_k=...) and
+    describe_index_stats().
+
+    On disk the index is an append-only matrix of normalised rows
+    (vectors.f32) and a JSON-lines sidecar (rows.jsonl) mapping each row to
+    its vector ID and metadata. Re-upserting an ID appends a new row and
+    retires the old one; deletes append a tombstone line. The matrix is
+    opened read-only with np.memmap, so worker processes on one host share
+    its pages, and nothing is read until the first query.
+
+    Once quantise_index() has written int8 codes, queries scan the codes
+    (a quarter of the float32 bytes), shortlist top_k * oversample rows and
+    rescore only those against the full-precision rows on disk. Rows added
+    after the last quantise_index() run are scored exactly.
+    """
+
+    def __init__(self, path, dim=None):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._ids = []
+        self._metadata = []
+        self._row_of = {}
+        self._live = np.zeros(0, dtype=bool)
+        self._rows_offset = 0
+        self._codes = None
+        self._scales = None
+        self._codes_stat = None
+        self._field_codes_cache = {}
+
+        info_path = os.path.join(path, INFO_FILE)
+        if os.path.exists(info_path):
+            with open(info_path, "r") as f:
+                self.dim = json.load(f)["dim"]
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @contextlib.contextmanager
+    def _write_lock(self):
+        # Writers in other processes take turns, so row numbers stay in step
+        # with the vectors file
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file(LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        # Picks up rows appended since the last call, by this process or by
+        # an ingestion run writing to the same directory.
+        self._refresh_codes()
+        rows_path = self._file(ROWS_FILE)
+        if not os.path.exists(rows_path) or os.path.getsize(rows_path) <= self._rows_offset:
+            return
+
+        with open(rows_path, "rb") as f:
+            f.seek(self._rows_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # ignore a line that is still being written
+        self._rows_offset += end
+
+        live = list(self._live)
+        for line in data[:end].splitlines():
+            record = json.loads(line)
+            old_row = self._row_of.pop(record["id"], None)
+            if old_row is not None:
+                live[old_row] = False
+            row = record.get("row")
+            if row is None:
+                continue
+            # Rows are placed by the number they were written with; any gap
+            # left behind is a dead row with no ID
+            while len(self._ids) <= row:
+                self._ids.append(None)
+                self._metadata.append({})
+                live.append(False)
+            if any(row < len(codes) for codes, _ in self._field_codes_cache.values()):
+                self._field_codes_cache = {}  # a row that was already coded changed
+            self._row_of[record["id"]] = row
+            self._ids[row] = record["id"]
+            self._metadata[row] = record.get("metadata", {})
+            live[row] = True
+
+        self._live = np.array(live, dtype=bool)
+        if self._ids:
+            self._vectors = np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode="r",
+                                      shape=(len(self._ids), self.dim))
+
+    def _refresh_codes(self):
+        codes_path = self._file(CODES_FILE)
+        if self.dim is None:
+            return
+        try:
+            stat = os.stat(codes_path)
+        except FileNotFoundError:
+            self._codes = self._scales = self._codes_stat = None
+            return
+        if (stat.st_ino, stat.st_size) == self._codes_stat:
+            return
+        self._codes_stat = (stat.st_ino, stat.st_size)
+        header = self.dim * 4
+        n_codes = (stat.st_size - header) // self.dim
+        self._scales = np.fromfile(codes_path, dtype=np.float32, count=self.dim)
+        self._codes = np.memmap(codes_path, dtype=np.int8, mode="r", offset=header,
+                                shape=(n_codes, self.dim)) if n_codes else None
+
+    def upsert(self, vectors, **kwargs):
+        ids, values, metadatas = [], [], []
+        for vector in vectors:
+            if isinstance(vector, dict):
+                vector = (vector["id"], vector["values"], vector.get("metadata", {}))
+            ids.append(vector[0])
+            values.append(vector[1])
+            metadatas.append(vector[2] if len(vector) > 2 else {})
+        if not ids:
+            return {"upserted_count": 0}
+
+        rows = normalise_rows(values)
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            if self.dim is None:
+                self.dim = rows.shape[1]
+            if not os.path.exists(self._file(INFO_FILE)):
+                with open(self._file(INFO_FILE), "w") as f:
+                    json.dump({"dim": self.dim, "metric": "cosine"}, f)
+            if rows.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dim vectors, got {rows.shape[1]}")
+
+            with self._write_lock():
+                self._refresh()
+                first_row = len(self._ids)
+                # Vectors land before their sidecar lines, so readers never see
+                # a row whose vector isn't on disk yet. Vectors past the last
+                # indexed row were left by a crashed write and are dropped.
+                with open(self._file(VECTORS_FILE), "ab") as f:
+                    f.truncate(first_row * self.dim * 4)
+                    f.write(rows.tobytes())
+                with open(self._file(ROWS_FILE), "a") as f:
+                    for offset, (vector_id, metadata) in enumerate(zip(ids, metadatas)):
+                        f.write(json.dumps({"id": vector_id, "row": first_row + offset, "metadata": metadata}) + "\n")
+                self._refresh()
+
+        return {"upserted_count": len(ids)}
+
+    def delete(self, ids, **kwargs):
+        with self._lock, self._write_lock():
+            self._refresh()
+            with open(self._file(ROWS_FILE), "a") as f:
+                for vector_id in ids:
+                    if vector_id in self._row_of:
+                        f.write(json.dumps({"id": vector_id, "row": None}) + "\n")
+            self._refresh()
+
+    def _field_codes(self, field):
+        # Metadata values of one field as small ints, so filters are a
+        # vectorised np.isin rather than a Python loop over every row.
+        codes, lookup = self._field_codes_cache.get(field, (np.zeros(0, dtype=np.int32), {}))
+        if len(codes) < len(self._metadata):
+            new_codes = [lookup.setdefault(metadata.get(field), len(lookup))
+                         for metadata in self._metadata[len(codes):]]
+            codes = np.concatenate([codes, np.asarray(new_codes, dtype=np.int32)])
+            self._field_codes_cache[field] = (codes, lookup)
+        return codes, lookup
+
+    def _filter_mask(self, filter):
+        # Supports the Pinecone filter forms the app sends:
+        # {"field": value}, {"field": {"$eq": value}} and {"field": {"$in": [...]}}
+        mask = self._live.copy()
+        for field, condition in filter.items():
+            if isinstance(condition, dict):
+                values = condition["$in"] if "$in" in condition else [condition["$eq"]]
+            else:
+                values = [condition]
+            codes, lookup = self._field_codes(field)
+            mask &= np.isin(codes, [lookup[value] for value in values if value in lookup])
+        return mask
+
+    def query(self, vector, top_k=5, include_metadata=False, filter=None, oversample=OVERSAMPLE, **kwargs):
+        with self._lock:
+            self._refresh()
+            if self._vectors is None:
+                return {"matches": []}
+            vectors, live, ids, metadata = self._vectors, self._live, self._ids, self._metadata
+            codes, scales = self._codes, self._scales
+            # A filter narrows the search to a subset of rows, which are
+            # gathered and scored on their own; otherwise scan everything.
+            if filter:
+                candidates = np.flatnonzero(self._filter_mask(filter))
+                n_candidates = len(candidates)
+            else:
+                candidates = None
+                n_candidates = len(self._row_of)
+
+        query = normalise_rows(vector)[0]
+        top_k = min(top_k, n_candidates)
+        if top_k <= 0:
+            return {"matches": []}
+
+        if codes is None or oversample is None:
+            if candidates is None:
+                scores = vectors @ query
+                scores[~live] = -np.inf
+                rows = top_k_rows(scores, top_k)
+                row_scores = scores[rows]
+            else:
+                scores = vectors[candidates] @ query
+                top = top_k_rows(scores, top_k)
+                rows, row_scores = candidates[top], scores[top]
+        else:
+            n_codes = min(len(codes), len(vectors))
+            if candidates is None:
+                approx = np.empty(len(vectors), dtype=np.float32)
+                approx[:n_codes] = int8_scores(codes[:n_codes], query * scales)
+                approx[n_codes:] = vectors[n_codes:] @ query
+                approx[~live] = -np.inf
+                shortlist = top_k_rows(approx, min(top_k * oversample, n_candidates))
+            else:
+                coded = candidates < n_codes
+                approx = np.empty(len(candidates), dtype=np.float32)
+                approx[coded] = int8_scores(codes[candidates[coded]], query * scales)
+                approx[~coded] = vectors[candidates[~coded]] @ query
+                shortlist = candidates[top_k_rows(approx, min(top_k * oversample, n_candidates))]
+            shortlist = np.sort(shortlist)
+            exact = vectors[shortlist] @ query
+            order = top_k_rows(exact, top_k)
+            rows, row_scores = shortlist[order], exact[order]
+
+        matches = []
+        for row, score in zip(rows, row_scores):
+            match = {"id": ids[row], "score": float(score)}
+            if include_metadata:
+                match["metadata"] = metadata[row]
+            matches.append(match)
+        return {"matches": matches}
+
+    def describe_index_stats(self, **kwargs):
+        with self._lock:
+            self._refresh()
+            return {"dimension": self.dim, "total_vector_count": len(self._row_of)}